@@ -0,0 +1,35 @@
+## Importing libraries and files
+import hashlib
+import os
+import re
+
+from cache import TieredCache, file_sha256
+
+## Analysis result cache
+# Finished crew analyses are cached by document content, normalized query,
+# model and execution mode, so re-submitting the same filing with the same
+# question returns immediately. Entries expire after ANALYSIS_CACHE_TTL seconds
+# and persist in ANALYSIS_CACHE_DB (set it empty to keep them in memory only).
+ANALYSIS_CACHE_TTL = float(os.environ.get("ANALYSIS_CACHE_TTL", str(24 * 60 * 60)))
+
+# Bump when prompts or agents change so stale analyses are not served
+_ANALYSIS_VERSION = 1
+
+analysis_cache = TieredCache(
+    name="analysis",
+    max_entries=int(os.environ.get("ANALYSIS_CACHE_SIZE", "64")),
+    db_path=os.environ.get("ANALYSIS_CACHE_DB", "data/analysis_cache.sqlite3") or None,
+    max_disk_entries=int(os.environ.get("ANALYSIS_CACHE_DISK_SIZE", "1024")),
+    ttl_seconds=ANALYSIS_CACHE_TTL,
+)
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query or "").strip().lower().rstrip(".?! ")
+
+
+def analysis_cache_key(file_path: str, query: str, mode: str) -> str:
+    from agents import get_llm
+    query_hash = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:16]
+    return f"v{_ANALYSIS_VERSION}:{file_sha256(file_path)}:{get_llm().model}:{mode}:{query_hash}"
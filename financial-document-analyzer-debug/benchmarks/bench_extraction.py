@@ -0,0 +1,137 @@
+"""Compare the streaming extraction pipeline against the original read_data_tool code.
+
+Each implementation runs in a fresh subprocess so peak RSS is measured in
+isolation. The extraction cache is bypassed; only parsing and formatting are timed.
+
+Usage:
+    python benchmarks/bench_extraction.py data/TSLA-Q2-2025-Update.pdf --repeat 3
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def legacy_read(file_path: str, max_pages: int = 50, focus_sections: bool = True) -> str:
+    """The pre-streaming read_data_tool body, kept verbatim as the baseline."""
+    from pypdf import PdfReader
+    from extraction import financial_keywords
+
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    full_report = ""
+    prioritized_pages = []
+    other_pages = []
+
+    if focus_sections and total_pages > 30:
+        for i, page in enumerate(reader.pages):
+            content = page.extract_text()
+            if content:
+                content_lower = content.lower()
+                has_financial_content = any(keyword in content_lower for keyword in financial_keywords)
+                if has_financial_content:
+                    prioritized_pages.append((i, content))
+                else:
+                    other_pages.append((i, content))
+        pages_to_extract = prioritized_pages + other_pages[:max(0, max_pages - len(prioritized_pages))]
+    else:
+        limit = max_pages if max_pages > 0 else total_pages
+        pages_to_extract = [(i, page.extract_text()) for i, page in enumerate(reader.pages[:limit])]
+
+    for page_num, content in pages_to_extract:
+        if content:
+            while "\n\n" in content:
+                content = content.replace("\n\n", "\n")
+            full_report += f"[Page {page_num + 1}]\n{content}\n\n"
+    return full_report
+
+
+def streaming_read(file_path: str, max_pages: int = 50, focus_sections: bool = True) -> str:
+    from extraction import _extract_uncached, format_pages
+
+    return format_pages(_extract_uncached(file_path, max_pages, focus_sections)["pages"])
+
+
+IMPLEMENTATIONS = {
+    "legacy": legacy_read,
+    "streaming": streaming_read,
+}
+
+
+def run_worker(impl: str, file_path: str, max_pages: int, focus_sections: bool) -> dict:
+    import pypdf  # noqa: F401  (import cost excluded from the measurement)
+    import extraction  # noqa: F401
+
+    func = IMPLEMENTATIONS[impl]
+    baseline_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = time.perf_counter()
+    report = func(file_path, max_pages, focus_sections)
+    wall_s = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "impl": impl,
+        "wall_s": round(wall_s, 4),
+        "peak_rss_kb": peak_rss_kb,
+        "rss_growth_kb": peak_rss_kb - baseline_rss_kb,
+        "traced_peak_kb": traced_peak // 1024,
+        "output_chars": len(report),
+    }
+
+
+def run_isolated(impl: str, args) -> dict:
+    cmd = [
+        sys.executable, os.path.abspath(__file__), args.pdf,
+        "--worker", impl,
+        "--max-pages", str(args.max_pages),
+    ]
+    if args.no_focus:
+        cmd.append("--no-focus")
+    completed = subprocess.run(cmd, check=True, capture_output=True, text=True, cwd=PROJECT_DIR)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", help="PDF file to extract")
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--no-focus", action="store_true", help="Disable focus_sections")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--worker", choices=sorted(IMPLEMENTATIONS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.pdf = os.path.abspath(args.pdf)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.pdf, args.max_pages, not args.no_focus)))
+        return
+
+    summary = {}
+    for impl in IMPLEMENTATIONS:
+        runs = [run_isolated(impl, args) for _ in range(args.repeat)]
+        summary[impl] = {
+            "best_wall_s": min(run["wall_s"] for run in runs),
+            "peak_rss_kb": max(run["peak_rss_kb"] for run in runs),
+            "rss_growth_kb": max(run["rss_growth_kb"] for run in runs),
+            "traced_peak_kb": max(run["traced_peak_kb"] for run in runs),
+            "output_chars": runs[0]["output_chars"],
+        }
+        print(f"{impl:>10}: {summary[impl]}")
+
+    legacy, streaming = summary["legacy"], summary["streaming"]
+    if streaming["best_wall_s"]:
+        print(f"speedup: {legacy['best_wall_s'] / streaming['best_wall_s']:.2f}x, "
+              f"traced peak: {legacy['traced_peak_kb']} KB -> {streaming['traced_peak_kb']} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""Offline benchmark suite: extraction, crew orchestration overhead and /analyze load.
+
+Runs without API keys or network: the LLM is replaced by the deterministic
+stand-in in ``benchmarks/stubs.py``, web searches use the fixture search
+backend and the documents are synthetic filings from ``benchmarks/synthetic_pdf.py``.
+
+Scenarios:
+    extraction  read_data_tool on 5-500 page filings: cold, warm and query-focused
+    crew        run_crew end to end with a zero-latency LLM (pure orchestration overhead)
+    load        concurrent POST /analyze through the FastAPI test client
+    startup     fresh-interpreter `import main` time and time until /readyz reports ready
+
+Results are written as JSON; pass a previous result file to --compare to flag
+regressions beyond --tolerance. --import-budget fails the run when importing
+the API module takes longer than the given number of seconds.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --scenarios extraction --pages 5 50 500
+    python benchmarks/run_benchmarks.py --output new.json --compare bench.json
+    python benchmarks/run_benchmarks.py --scenarios startup --import-budget 1.5
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+SCENARIOS = ("extraction", "crew", "load", "startup")
+DEFAULT_QUERY = "Analyze this financial document for investment insights"
+
+
+def configure_offline_environment(workdir: str) -> None:
+    """Point every setting at ``workdir`` and disable rate limits, telemetry and persistent caches.
+
+    Must run before any project module is imported.
+    """
+    defaults = {
+        "GROQ_API_KEY": "offline-benchmark",
+        "SERPER_API_KEY": "offline-benchmark",
+        "OTEL_SDK_DISABLED": "true",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "LLM_RPM": "0",
+        "LLM_TPM": "0",
+        "CREW_RUNS_PER_MINUTE": "0",
+        "RATE_LIMIT_DB": os.path.join(workdir, "rate_limit.sqlite3"),
+        "JOBS_DB": os.path.join(workdir, "jobs.sqlite3"),
+        "ANALYSIS_CACHE_DB": "",
+        "SEARCH_CACHE_DB": "",
+        "SEARCH_BACKEND": "fixture",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    # Uploads land in ./data; keep them out of the project tree
+    os.chdir(workdir)
+
+
+def install_stubs(llm_latency_s: float, search_latency_s: float):
+    """Swap the stand-in LLM and search backend in before any crew is built."""
+    import agents
+    import search
+    from stubs import StubLLM
+
+    agents.llm = StubLLM(latency_s=llm_latency_s)
+    search.search_backend = search.FixtureSearchBackend(latency_s=search_latency_s)
+
+
+def clear_caches() -> None:
+    import cache
+    from analysis_cache import analysis_cache
+    from extraction import extraction_cache
+    from retrieval import index_cache
+    from search import search_cache
+    from statements import statements_cache
+
+    for tiered in (extraction_cache, index_cache, statements_cache, analysis_cache, search_cache):
+        tiered.clear()
+    with cache._file_hash_lock:
+        cache._file_hash_memo.clear()
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def bench_extraction(pdfs: dict, repeat: int) -> dict:
+    """read_data_tool timings per document size."""
+    from retrieval import estimate_tokens
+    from tools import read_data_tool
+
+    # Pay first-call import and parser warm-up outside the measurement
+    read_data_tool.func(next(iter(pdfs.values())))
+
+    results = {}
+    for pages, path in pdfs.items():
+        cold, warm, focused = [], [], []
+        output = ""
+        for _ in range(repeat):
+            clear_caches()
+            seconds, output = _timed(read_data_tool.func, path)
+            cold.append(seconds)
+            warm.append(_timed(read_data_tool.func, path)[0])
+            clear_caches()
+            focused.append(_timed(read_data_tool.func, path, query="revenue net income cash flow")[0])
+        results[f"{pages}_pages"] = {
+            "cold_s": round(min(cold), 4),
+            "warm_s": round(min(warm), 5),
+            "query_cold_s": round(min(focused), 4),
+            "output_tokens": estimate_tokens(output),
+        }
+        print(f"  extraction {pages:>4} pages: {results[f'{pages}_pages']}", file=sys.stderr)
+    return results
+
+
+def bench_crew(pdf: str, repeat: int) -> dict:
+    """run_crew wall time with a zero-latency LLM, split into LLM, tool and orchestration time."""
+    import main
+    from metrics import trace_request
+
+    results = {}
+    main.run_crew(DEFAULT_QUERY, pdf)  # builds the pooled crew outside the measurement
+    for mode in ("sequential", "parallel"):
+        runs = []
+        for _ in range(repeat):
+            with trace_request() as trace:
+                seconds, _ = _timed(main.run_crew, DEFAULT_QUERY, pdf, mode=mode)
+            stages = trace.summary()["stages"]
+            llm = stages.get("llm", {"count": 0, "seconds": 0.0})
+            tool = stages.get("tool", {"count": 0, "seconds": 0.0})
+            runs.append({
+                "wall_s": seconds,
+                "llm_calls": llm["count"],
+                "tool_calls": tool["count"],
+                "overhead_s": seconds - llm["seconds"] - tool["seconds"],
+            })
+        results[mode] = {
+            "best_wall_s": round(min(run["wall_s"] for run in runs), 4),
+            "median_wall_s": round(statistics.median(run["wall_s"] for run in runs), 4),
+            "median_overhead_s": round(statistics.median(run["overhead_s"] for run in runs), 4),
+            "llm_calls": runs[-1]["llm_calls"],
+            "tool_calls": runs[-1]["tool_calls"],
+        }
+        print(f"  crew {mode}: {results[mode]}", file=sys.stderr)
+    return results
+
+
+def bench_load(pdf: str, requests: int, concurrency: int) -> dict:
+    """Concurrent POST /analyze: distinct queries (crew runs), then one repeated query (cache hits)."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with open(pdf, "rb") as f:
+        payload = f.read()
+
+    def post(client, query):
+        started = time.perf_counter()
+        response = client.post(
+            "/analyze",
+            files={"file": ("filing.pdf", payload, "application/pdf")},
+            data={"query": query},
+        )
+        return time.perf_counter() - started, response.status_code, response.headers.get("x-cache")
+
+    def run(client, queries):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(lambda query: post(client, query), queries))
+        wall = time.perf_counter() - started
+        latencies = [seconds for seconds, _, _ in outcomes]
+        return {
+            "requests": len(outcomes),
+            "errors": sum(1 for _, status, _ in outcomes if status != 200),
+            "cache_hits": sum(1 for _, _, cache in outcomes if cache == "HIT"),
+            "wall_s": round(wall, 4),
+            "requests_per_s": round(len(outcomes) / wall, 3) if wall else None,
+            "p50_s": round(_percentile(latencies, 0.5), 4),
+            "p95_s": round(_percentile(latencies, 0.95), 4),
+        }
+
+    clear_caches()
+    with TestClient(main.app) as client:
+        results = {
+            "concurrency": concurrency,
+            "uncached": run(client, [f"{DEFAULT_QUERY} (request {n})" for n in range(requests)]),
+            "cached": run(client, [f"{DEFAULT_QUERY} (request 0)"] * requests),
+        }
+    print(f"  load: {results}", file=sys.stderr)
+    return results
+
+
+# Run in a fresh interpreter so module caches from earlier scenarios don't hide import cost
+_STARTUP_PROBE = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+heavy = sorted(name for name in ("crewai", "crewai_tools", "litellm") if name in sys.modules)
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    while client.get("/readyz").status_code != 200 and time.perf_counter() - started < 120:
+        time.sleep(0.05)
+    ready = time.perf_counter() - started
+print(json.dumps({"import_s": imported, "ready_s": ready, "heavy_modules_at_import": heavy}))
+"""
+
+
+def bench_startup(repeat: int) -> dict:
+    """Cold `import main` and time until warm-up finishes, each in a new interpreter."""
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE, PROJECT_DIR], capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    results = {
+        "import_s": round(min(run["import_s"] for run in runs), 4),
+        "ready_s": round(min(run["ready_s"] for run in runs), 4),
+        "heavy_modules_at_import": runs[-1]["heavy_modules_at_import"],
+    }
+    print(f"  startup: {results}", file=sys.stderr)
+    return results
+
+
+def _flatten(data: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Print metric changes against ``baseline`` and return the regressed metric paths.
+
+    Rates (``*_per_s``) should not drop and durations (``*_s``) should not
+    grow by more than ``tolerance``; other numbers are informational.
+    """
+    regressions = []
+    now, before = _flatten(current["results"]), _flatten(baseline["results"])
+    for path in sorted(now.keys() & before.keys()):
+        old, new = before[path], now[path]
+        if not old:
+            continue
+        change = (new - old) / old
+        if path.endswith("_per_s"):
+            regressed = change < -tolerance
+        elif path.endswith("_s"):
+            regressed = change > tolerance
+        else:
+            regressed = False
+        marker = "REGRESSION" if regressed else ""
+        print(f"{path:<55} {old:>12g} -> {new:<12g} {change:+7.1%} {marker}")
+        if regressed:
+            regressions.append(path)
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--pages", nargs="+", type=int, default=[5, 50, 200, 500], help="Synthetic filing sizes for extraction")
+    parser.add_argument("--crew-pages", type=int, default=20, help="Filing size for the crew and load scenarios")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=16, help="Requests per load phase")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per stub LLM call in the load scenario")
+    parser.add_argument("--output", help="Write results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before flagging a regression")
+    parser.add_argument("--import-budget", type=float, help="Fail when the startup scenario's import_s exceeds this many seconds")
+    parser.add_argument("--verbose", action="store_true", help="Show crew output")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = tempfile.mkdtemp(prefix="fda-bench-")
+    configure_offline_environment(workdir)
+    from synthetic_pdf import write_pdf
+
+    sizes = sorted(set(args.pages) | {args.crew_pages})
+    pdfs = {pages: write_pdf(os.path.join(workdir, f"filing_{pages}.pdf"), pages) for pages in sizes}
+
+    install_stubs(llm_latency_s=0.0, search_latency_s=0.0)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    results = {}
+    with quiet:
+        if "extraction" in args.scenarios:
+            results["extraction"] = bench_extraction({pages: pdfs[pages] for pages in args.pages}, args.repeat)
+        if "crew" in args.scenarios:
+            results["crew"] = bench_crew(pdfs[args.crew_pages], args.repeat)
+        if "load" in args.scenarios:
+            import agents
+            agents.llm.latency_s = args.llm_latency
+            results["load"] = bench_load(pdfs[args.crew_pages], args.requests, args.concurrency)
+        if "startup" in args.scenarios:
+            results["startup"] = bench_startup(args.repeat)
+            if args.import_budget is not None:
+                results["startup"]["import_budget_s"] = args.import_budget
+                results["startup"]["over_budget"] = results["startup"]["import_s"] > args.import_budget
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"Results written to {output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if results.get("startup", {}).get("over_budget"):
+        print(f"Importing main took {results['startup']['import_s']}s, over the {args.import_budget}s budget", file=sys.stderr)
+        sys.exit(1)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Generate deterministic synthetic financial filings as PDFs.
+
+The first pages carry an income statement, balance sheet and cash flow
+statement with two comparable periods; the rest cycle through MD&A, risk
+factor, notes and boilerplate pages so page scoring and retrieval see a
+realistic mix. The same ``pages`` and ``seed`` always produce the same bytes.
+
+Usage:
+    python benchmarks/synthetic_pdf.py out.pdf --pages 200
+"""
+import argparse
+import random
+
+PERIODS = ("Q2 2025", "Q2 2024")
+
+INCOME_ROWS = [
+    ("Total revenues", 24000, 26000),
+    ("Cost of revenues", 19000, 21000),
+    ("Gross profit", 4500, 5500),
+    ("Research and development", 1200, 1100),
+    ("Selling, general and administrative", 1300, 1250),
+    ("Income from operations", 900, 1600),
+    ("Interest income", 350, 330),
+    ("Net income", 1100, 1500),
+    ("Diluted EPS", 0.33, 0.42),
+]
+BALANCE_ROWS = [
+    ("Cash and cash equivalents", 16000, 15500),
+    ("Accounts receivable", 3800, 3300),
+    ("Inventory", 14000, 14200),
+    ("Total current assets", 58000, 52000),
+    ("Property, plant and equipment, net", 36000, 31000),
+    ("Total assets", 125000, 112000),
+    ("Accounts payable", 14000, 14500),
+    ("Total current liabilities", 30000, 28000),
+    ("Total debt and finance leases", 7000, 6200),
+    ("Total liabilities", 49000, 44000),
+    ("Total stockholders equity", 76000, 68000),
+]
+CASH_FLOW_ROWS = [
+    ("Net cash provided by operating activities", 2500, 3600),
+    ("Capital expenditures", -2400, -2300),
+    ("Free cash flow", 100, 1300),
+    ("Net cash used in investing activities", -4500, -3100),
+    ("Net cash provided by financing activities", 300, 100),
+]
+
+MDNA = (
+    "Management discussion and analysis. Revenue for the quarter reflected lower average selling prices "
+    "offset by growth in services. Operating margins declined as the company invested in new products. "
+    "Operating cash flow remained positive and the balance sheet holds substantial cash and cash equivalents. "
+    "Earnings per share declined year over year while gross margin stabilized sequentially."
+)
+RISKS = (
+    "Risk factors. Our liquidity may be affected by supply chain disruptions, tariffs and interest rate changes. "
+    "We have debt obligations and lease commitments that require cash. Competition may reduce margins. "
+    "Regulatory investigations and litigation could result in material losses. Foreign exchange volatility "
+    "affects reported revenue and costs."
+)
+BOILERPLATE = (
+    "This document contains forward-looking statements within the meaning of applicable securities laws. "
+    "Words such as expect, anticipate, intend and plan identify such statements. Actual results may differ "
+    "materially. The company undertakes no obligation to update these statements except as required by law."
+)
+
+
+def _money(value: float) -> str:
+    if isinstance(value, float) and abs(value) < 100:
+        text = f"{abs(value):.2f}"
+    else:
+        text = f"{abs(round(value)):,}"
+    return f"({text})" if value < 0 else text
+
+
+def _statement(title: str, rows, rng) -> list:
+    lines = [f"Consolidated {title}", "(in millions, except per share data, unaudited)", f"{PERIODS[0]} {PERIODS[1]}"]
+    for label, current, prior in rows:
+        # Jitter the figures so every seed yields a different but stable filing
+        current = current * rng.uniform(0.95, 1.05) if abs(current) >= 100 else current
+        prior = prior * rng.uniform(0.95, 1.05) if abs(prior) >= 100 else prior
+        lines.append(f"{label} {_money(current)} {_money(prior)}")
+    return lines
+
+
+def _paragraph_lines(text: str, rng, sentences: int = 24, width: int = 95) -> list:
+    words = []
+    for _ in range(sentences):
+        words.extend(rng.choice(text.split(". ")).split())
+    lines, line = [], ""
+    for word in words:
+        if len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = ""
+        line = f"{line} {word}".strip()
+    if line:
+        lines.append(line)
+    return lines
+
+
+def page_lines(page_index: int, company: str, rng) -> list:
+    """Text lines for one page of the synthetic filing."""
+    header = [f"{company} Quarterly Update {PERIODS[0]}", f"Page {page_index + 1}"]
+    fixed = {
+        0: [f"{company} Quarterly Update", f"Financial results for {PERIODS[0]}", "Highlights: revenue, net income and free cash flow"],
+        1: _statement("Statements of Operations", INCOME_ROWS, rng),
+        2: _statement("Balance Sheets", BALANCE_ROWS, rng),
+        3: _statement("Statements of Cash Flows", CASH_FLOW_ROWS, rng),
+    }
+    if page_index in fixed:
+        return header + fixed[page_index]
+    kind = page_index % 4
+    if kind == 0:
+        return header + _paragraph_lines(MDNA, rng)
+    if kind == 1:
+        return header + _paragraph_lines(RISKS, rng)
+    if kind == 2:
+        return header + ["Notes to the financial statements"] + [
+            f"Segment {n} revenue {_money(rng.uniform(500, 9000))} {_money(rng.uniform(500, 9000))}" for n in range(1, 9)
+        ]
+    return header + _paragraph_lines(BOILERPLATE, rng)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages: int, seed: int = 0, company: str = "Acme Motors Inc.") -> bytes:
+    """Return the bytes of a ``pages``-page synthetic filing."""
+    rng = random.Random(seed)
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    next_id = 4
+    for page_index in range(pages):
+        text_ops = " ".join(f"({_escape(line)}) '" for line in page_lines(page_index, company, rng))
+        stream = f"BT /F1 9 Tf 40 760 Td 11 TL {text_ops} ET"
+        objects[next_id] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+        objects[next_id + 1] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {next_id} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(next_id + 1)
+        next_id += 2
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += f"{object_id} 0 obj\n{objects[object_id]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {next_id}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offsets[object_id]:010d} 00000 n \n" for object_id in range(1, next_id)).encode()
+    out += f"trailer\n<< /Size {next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def write_pdf(path: str, pages: int, seed: int = 0) -> str:
+    with open(path, "wb") as f:
+        f.write(build_pdf(pages, seed))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="PDF file to write")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_pdf(args.output, args.pages, args.seed)
+    print(f"Wrote {args.pages}-page synthetic filing to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+## Importing libraries and files
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_MISSING = object()
+
+## File hashing
+# Hashes are memoized per (path, size, mtime) so repeated tool calls on the same
+# upload within one request only read the file from disk once.
+_file_hash_memo = OrderedDict()
+_file_hash_lock = threading.Lock()
+_FILE_HASH_MEMO_SIZE = 256
+
+
+def _file_signature(file_path: str):
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file's bytes."""
+    signature = _file_signature(file_path)
+    with _file_hash_lock:
+        digest = _file_hash_memo.get(signature)
+        if digest is not None:
+            _file_hash_memo.move_to_end(signature)
+            return digest
+
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(block)
+    digest = hasher.hexdigest()
+
+    with _file_hash_lock:
+        _file_hash_memo[signature] = digest
+        while len(_file_hash_memo) > _FILE_HASH_MEMO_SIZE:
+            _file_hash_memo.popitem(last=False)
+    return digest
+
+
+def register_file_hash(file_path: str, digest: str) -> None:
+    """Seed the hash memo for a file whose digest was computed while writing it."""
+    signature = _file_signature(file_path)
+    with _file_hash_lock:
+        _file_hash_memo[signature] = digest
+        while len(_file_hash_memo) > _FILE_HASH_MEMO_SIZE:
+            _file_hash_memo.popitem(last=False)
+
+
+class TieredCache:
+    """Thread-safe LRU cache with an optional SQLite-backed on-disk tier.
+
+    The in-memory tier holds at most ``max_entries`` values and evicts the least
+    recently used one first. When ``db_path`` is set, every value is also written
+    to disk (pickled) so it survives restarts and can be shared between worker
+    processes; the disk tier is bounded by ``max_disk_entries`` with the same
+    LRU policy.
+
+    With ``ttl_seconds`` set, entries older than that are treated as misses and
+    dropped from both tiers when next looked up.
+    """
+
+    def __init__(self, name: str, max_entries: int = 128, db_path: str = None, max_disk_entries: int = 1024,
+                 ttl_seconds: float = None):
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+        if self.db_path:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache_entries ("
+                    " cache TEXT NOT NULL,"
+                    " key TEXT NOT NULL,"
+                    " value BLOB NOT NULL,"
+                    " accessed_at REAL NOT NULL,"
+                    " created_at REAL NOT NULL DEFAULT 0,"
+                    " PRIMARY KEY (cache, key))"
+                )
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")]
+                if "created_at" not in columns:
+                    # Databases created before TTL support; their rows count as expired
+                    conn.execute("ALTER TABLE cache_entries ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str, default=None):
+        """Return the cached value for ``key`` or ``default`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+
+        if self.db_path:
+            created_at, value = self._disk_get(key)
+            if value is not _MISSING:
+                with self._lock:
+                    self._disk_hits += 1
+                    self._store_in_memory(key, value, created_at)
+                return value
+
+        with self._lock:
+            self._misses += 1
+        return default
+
+    def set(self, key: str, value) -> None:
+        """Store ``value`` under ``key`` in every configured tier."""
+        created_at = time.time()
+        with self._lock:
+            self._store_in_memory(key, value, created_at)
+        if self.db_path:
+            self._disk_set(key, value, created_at)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM cache_entries WHERE cache = ?", (self.name,))
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round((self._hits + self._disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_enabled": bool(self.db_path),
+            }
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _store_in_memory(self, key, value, created_at):
+        # Caller must hold self._lock
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _disk_get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE cache = ? AND key = ?",
+                (self.name, key),
+            ).fetchone()
+            if row is None:
+                return None, _MISSING
+            if self._expired(row[1]):
+                conn.execute("DELETE FROM cache_entries WHERE cache = ? AND key = ?", (self.name, key))
+                with self._lock:
+                    self._expirations += 1
+                return None, _MISSING
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE cache = ? AND key = ?",
+                (time.time(), self.name, key),
+            )
+        return row[1], pickle.loads(row[0])
+
+    def _disk_set(self, key, value, created_at):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (cache, key, value, accessed_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (self.name, key, payload, created_at, created_at),
+            )
+            # Evict least recently used rows beyond the disk bound
+            conn.execute(
+                "DELETE FROM cache_entries WHERE cache = ? AND key IN ("
+                " SELECT key FROM cache_entries WHERE cache = ?"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.name, self.name, self.max_disk_entries),
+            )
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for and share its result (or exception). Nothing is
+    kept once the call finishes, so this deduplicates in-flight work only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._shared = 0
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                self._executed += 1
+                leader = True
+            else:
+                self._shared += 1
+                leader = False
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": len(self._calls),
+                "executed": self._executed,
+                "coalesced": self._shared,
+            }
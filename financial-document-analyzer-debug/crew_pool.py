@@ -0,0 +1,319 @@
+## Importing libraries and files
+import contextvars
+import datetime
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from metrics import record
+from retrieval import estimate_tokens
+
+# crewai, the agents and the tasks are imported when the first crew is built,
+# so importing this module (and main) stays fast and works without an API key
+
+# Execution order of the sequential crew
+AGENT_ORDER = ["verifier", "financial_analyst", "investment_advisor", "risk_assessor"]
+TASK_ORDER = ["verification", "analyze_financial_document_task", "investment_analysis", "risk_assessment"]
+
+## Execution modes
+# sequential: the four tasks run one after another, each seeing every earlier output.
+# parallel: verification runs first, then the three analysis tasks fan out at
+# once with the verification report as their shared context.
+# incremental: for a revised version of an already analyzed filing, reuse the
+# previous report's sections and regenerate (side by side) only those whose
+# topics appear on changed pages; see revisions.py. Without a previous version
+# it runs like parallel.
+EXECUTION_MODES = ("sequential", "parallel", "incremental")
+DEFAULT_EXECUTION_MODE = os.environ.get("CREW_EXECUTION_MODE", "sequential")
+
+# Section headings used when merging fanned-out task outputs into one report
+SECTION_TITLES = {
+    "verification": "Document Verification",
+    "analyze_financial_document_task": "Financial Analysis",
+    "investment_analysis": "Investment Analysis",
+    "risk_assessment": "Risk Assessment",
+}
+
+# Terms that tie a page to the report sections built from it (matched against
+# lower-cased page text), following each task's expected output in task.py.
+# A changed page regenerates every section whose terms it contains.
+SECTION_TOPICS = {
+    "verification": (
+        "10-k", "10-q", "annual report", "quarterly report", "amendment", "restated", "fiscal year",
+        "period ended", "quarter ended", "ticker",
+    ),
+    "analyze_financial_document_task": (
+        "revenue", "net income", "gross profit", "operating income", "margin", "earnings per share", "eps",
+        "balance sheet", "total assets", "liabilities", "equity", "cash flow", "operating activities",
+        "investing activities", "financing activities", "capital expenditure",
+    ),
+    "investment_analysis": (
+        "guidance", "outlook", "forecast", "growth", "valuation", "dividend", "repurchase", "buyback",
+        "earnings per share", "eps", "revenue", "net income", "free cash flow",
+    ),
+    "risk_assessment": (
+        "risk", "debt", "liquidity", "leverage", "covenant", "litigation", "impairment", "going concern",
+        "interest rate", "regulatory", "liabilities", "contingenc", "cash flow",
+    ),
+}
+
+
+## Task and tool metrics
+# crewai emits these events synchronously on the thread running the task, so
+# the spans land in the request trace of that thread's context.
+_listeners_registered = False
+_listeners_lock = threading.Lock()
+
+
+def _seconds_since(started) -> float:
+    return (datetime.datetime.now() - started).total_seconds() if started else 0.0
+
+
+def _record_task_completed(source, event):
+    task = event.task
+    if task is not None:
+        raw = event.output.raw if event.output is not None else ""
+        record("task", task.name or task.agent.role, _seconds_since(task.start_time), completion_tokens=estimate_tokens(raw))
+
+
+def _record_task_failed(source, event):
+    task = event.task
+    if task is not None:
+        record("task", f"{task.name or task.agent.role} (failed)", _seconds_since(task.start_time))
+
+
+def _record_tool_call(source, event):
+    # Tool output is fed back into the agent's next prompt
+    seconds = (event.finished_at - event.started_at).total_seconds()
+    record("tool", event.tool_name, seconds, prompt_tokens=estimate_tokens(str(event.output or "")))
+
+
+def register_metrics_listeners() -> None:
+    """Subscribe the task and tool metrics to crewai's event bus (once per process)."""
+    global _listeners_registered
+    with _listeners_lock:
+        if _listeners_registered:
+            return
+        from crewai.utilities.events import crewai_event_bus, TaskCompletedEvent, TaskFailedEvent, ToolUsageFinishedEvent
+
+        crewai_event_bus.on(TaskCompletedEvent)(_record_task_completed)
+        crewai_event_bus.on(TaskFailedEvent)(_record_task_failed)
+        crewai_event_bus.on(ToolUsageFinishedEvent)(_record_tool_call)
+        _listeners_registered = True
+
+
+def _merge_sections(task_outputs: list, reused=()):
+    """One report from per-section task outputs (in ``TASK_ORDER``), headed by ``SECTION_TITLES``."""
+    from crewai.crews.crew_output import CrewOutput
+
+    parts = []
+    for name, output in zip(TASK_ORDER, task_outputs):
+        note = "_Unchanged: carried over from the analysis of the previous version._\n\n" if name in reused else ""
+        parts.append(f"## {SECTION_TITLES[name]}\n\n{note}{output.raw}")
+    return CrewOutput(raw="\n\n".join(parts), tasks_output=task_outputs)
+
+
+class CrewInstance:
+    """One isolated set of agents, tasks and the crew that runs them."""
+
+    def __init__(self):
+        from crewai import Crew, Process
+
+        from agents import create_agents
+        from task import create_tasks, create_update_tasks
+
+        register_metrics_listeners()
+        self.agents = create_agents()
+        self.tasks = create_tasks(self.agents)
+        for name, task in self.tasks.items():
+            task.name = name
+        self.crew = Crew(
+            agents=[self.agents[name] for name in AGENT_ORDER],
+            tasks=[self.tasks[name] for name in TASK_ORDER],
+            process=Process.sequential,
+            verbose=True,
+            # Tool results must not carry over between requests (see agents.create_agents)
+            cache=False,
+        )
+        # Parallel mode: one single-task crew per stage, sharing the agents above
+        self.parallel_tasks = create_tasks(self.agents, parallel=True)
+        for name, task in self.parallel_tasks.items():
+            task.name = name
+        self.stage_crews = {
+            name: Crew(agents=[task.agent], tasks=[task], process=Process.sequential, verbose=True, cache=False)
+            for name, task in self.parallel_tasks.items()
+        }
+        # Incremental mode: one single-task crew per section that revises its previous version
+        self.update_tasks = create_update_tasks(self.agents)
+        for name, task in self.update_tasks.items():
+            task.name = name
+        self.update_crews = {
+            name: Crew(agents=[task.agent], tasks=[task], process=Process.sequential, verbose=True, cache=False)
+            for name, task in self.update_tasks.items()
+        }
+
+    def run(self, inputs: dict, mode: str = "sequential", task_callback=None, plan: dict = None):
+        """Kick off this instance's crew in the given execution mode.
+
+        ``plan`` is the incremental plan from ``revisions.plan_incremental``;
+        incremental mode without one runs like parallel mode.
+        """
+        if mode == "incremental" and plan is not None:
+            return self._run_incremental(inputs, plan, task_callback)
+        if mode in ("parallel", "incremental"):
+            return self._run_parallel(inputs, task_callback)
+        self.crew.task_callback = task_callback
+        return self.crew.kickoff(inputs=inputs)
+
+    def _kickoff_concurrently(self, stages: dict) -> dict:
+        """Kick off ``{name: (crew, inputs)}`` side by side and return each crew's output by name."""
+        if not stages:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix="crew-stage") as executor:
+            # Each stage runs in a copy of the caller's context (request trace)
+            futures = {
+                name: executor.submit(contextvars.copy_context().run, crew.kickoff, inputs=stage_inputs)
+                for name, (crew, stage_inputs) in stages.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+
+    def _run_parallel(self, inputs: dict, task_callback=None):
+        for crew in self.stage_crews.values():
+            crew.task_callback = task_callback
+
+        verification = self.stage_crews["verification"].kickoff(inputs=inputs)
+        outputs = self._kickoff_concurrently({
+            name: (self.stage_crews[name], inputs) for name in TASK_ORDER if name != "verification"
+        })
+        outputs["verification"] = verification
+        return _merge_sections([outputs[name].tasks_output[0] for name in TASK_ORDER])
+
+    def _run_incremental(self, inputs: dict, plan: dict, task_callback=None):
+        from crewai.tasks.task_output import TaskOutput
+
+        for crew in self.update_crews.values():
+            crew.task_callback = task_callback
+
+        outputs = self._kickoff_concurrently({
+            name: (self.update_crews[name], {
+                **inputs,
+                "previous_report": plan["previous_sections"][name],
+                "changed_pages": plan["changed_text"][name],
+            })
+            for name in plan["regenerate"]
+        })
+        task_outputs = []
+        for name in TASK_ORDER:
+            if name in outputs:
+                task_outputs.append(outputs[name].tasks_output[0])
+            else:
+                task = self.update_tasks[name]
+                task_outputs.append(TaskOutput(
+                    name=name, description=task.description, agent=task.agent.role,
+                    raw=plan["previous_sections"][name],
+                ))
+        return _merge_sections(task_outputs, reused=[name for name in TASK_ORDER if name not in outputs])
+
+    def reset(self) -> None:
+        """Clear per-request state so the next request starts from a clean crew."""
+        for crew in [self.crew, *self.stage_crews.values(), *self.update_crews.values()]:
+            crew.task_callback = None
+        for task in [*self.tasks.values(), *self.parallel_tasks.values(), *self.update_tasks.values()]:
+            task.output = None
+            # Crew.kickoff copies task_callback into tasks that have none
+            task.callback = None
+            task.used_tools = 0
+            task.tools_errors = 0
+            task.delegations = 0
+            task.retry_count = 0
+            task.processed_by_agents = set()
+            task.start_time = None
+            task.end_time = None
+        for agent in self.agents.values():
+            agent.tools_results = []
+
+
+class CrewPool:
+    """Pool of pre-built crews handed out to one request at a time.
+
+    ``warm()`` builds every instance up front (at app startup); ``acquire()``
+    lazily builds instances up to ``size`` if the pool was not warmed and
+    otherwise blocks until one is returned. Instances are reset on release.
+    """
+
+    def __init__(self, size: int = 4, factory=CrewInstance):
+        self.size = max(1, size)
+        self.factory = factory
+        self._available = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._build_seconds = 0.0
+        self._acquires = 0
+        self._setup_seconds = 0.0
+        self._max_setup_seconds = 0.0
+
+    def _build(self):
+        start = time.perf_counter()
+        try:
+            instance = self.factory()
+        except BaseException:
+            # Give the reserved slot back so a later acquire can retry the build
+            with self._lock:
+                self._created -= 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._build_seconds += elapsed
+        return instance
+
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def warm(self) -> None:
+        """Build instances until the pool is full."""
+        while self._reserve_slot():
+            self._available.put(self._build())
+
+    @contextmanager
+    def acquire(self):
+        """Hand out an isolated crew instance for the duration of one request."""
+        start = time.perf_counter()
+        try:
+            instance = self._available.get_nowait()
+        except queue.Empty:
+            instance = self._build() if self._reserve_slot() else self._available.get()
+        setup_seconds = time.perf_counter() - start
+        with self._lock:
+            self._acquires += 1
+            self._setup_seconds += setup_seconds
+            self._max_setup_seconds = max(self._max_setup_seconds, setup_seconds)
+        record("crew_setup", "", setup_seconds)
+
+        try:
+            yield instance
+        finally:
+            instance.reset()
+            self._available.put(instance)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "available": self._available.qsize(),
+                "avg_build_ms": round(self._build_seconds / self._created * 1000, 2) if self._created else 0.0,
+                "acquires": self._acquires,
+                "avg_setup_ms": round(self._setup_seconds / self._acquires * 1000, 3) if self._acquires else 0.0,
+                "max_setup_ms": round(self._max_setup_seconds * 1000, 3),
+            }
+
+
+# CREW_POOL_SIZE bounds how many crews can run at once in this process
+crew_pool = CrewPool(size=int(os.environ.get("CREW_POOL_SIZE", "4")))
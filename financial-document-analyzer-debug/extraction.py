@@ -0,0 +1,226 @@
+## Importing libraries and files
+import heapq
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+load_dotenv()
+
+from cache import TieredCache, file_sha256
+from metrics import record, span
+
+# Key financial section keywords to prioritize
+financial_keywords = [
+    'income statement', 'balance sheet', 'cash flow', 'financial statements',
+    'revenue', 'net income', 'earnings', 'eps', 'ebitda', 'margins',
+    'assets', 'liabilities', 'equity', 'debt', 'cash and cash equivalents',
+    'operating', 'investing', 'financing', 'quarterly', 'annual',
+    'consolidated', 'unaudited', 'audited', 'management discussion'
+]
+
+## Extraction cache
+# Every page of a document is extracted once and cached under the SHA-256 of
+# the file bytes; the max_pages/focus_sections selection is applied to the
+# cached pages on each call. The verification gate, the read tools, retrieval,
+# statement parsing and revision fingerprints therefore share one parse per
+# request, and repeat uploads of the same filing skip PDF parsing entirely.
+# EXTRACTION_CACHE_SIZE bounds the in-memory tier (documents, LRU eviction);
+# EXTRACTION_CACHE_DB enables the optional on-disk SQLite tier.
+extraction_cache = TieredCache(
+    name="extraction",
+    max_entries=int(os.environ.get("EXTRACTION_CACHE_SIZE", "32")),
+    db_path=os.environ.get("EXTRACTION_CACHE_DB") or None,
+    max_disk_entries=int(os.environ.get("EXTRACTION_CACHE_DISK_SIZE", "512")),
+)
+
+
+# Bump when the shape or normalization of cached page text changes
+_EXTRACTION_VERSION = 3
+
+
+def extraction_cache_key(file_hash: str) -> str:
+    return f"v{_EXTRACTION_VERSION}:{file_hash}:all_pages"
+
+
+# Runs of blank lines collapse to a single newline in one linear pass
+_BLANK_LINES = re.compile(r"\n{2,}")
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse consecutive newlines in extracted page text."""
+    return _BLANK_LINES.sub("\n", text)
+
+
+def score_page(content_lower: str) -> int:
+    """Number of distinct financial keywords that appear on a page."""
+    return sum(1 for keyword in financial_keywords if keyword in content_lower)
+
+
+def iter_page_text(reader, stop: int = None):
+    """Yield ``(page_index, normalized_text)`` for each page with extractable text.
+
+    Pages are extracted lazily one at a time, so callers can consume the
+    document without holding every page's text in memory.
+    """
+    pages = reader.pages if stop is None else reader.pages[:stop]
+    for i, page in enumerate(pages):
+        started = time.perf_counter()
+        content = page.extract_text()
+        record("page_extract", "serial", time.perf_counter() - started)
+        if content:
+            yield i, normalize_whitespace(content)
+
+
+## Parallel extraction
+# PDF_EXTRACTION_WORKERS > 0 enables a process pool shared by the whole app;
+# documents with at least PDF_PARALLEL_MIN_PAGES pages are split into ranges of
+# PDF_PARALLEL_CHUNK_PAGES pages that workers parse independently.
+PDF_EXTRACTION_WORKERS = int(os.environ.get("PDF_EXTRACTION_WORKERS", "0"))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_PARALLEL_CHUNK_PAGES = int(os.environ.get("PDF_PARALLEL_CHUNK_PAGES", "16"))
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def start_process_pool(workers: int = None):
+    """Create the shared extraction process pool if it is enabled and not running."""
+    global _process_pool
+    workers = PDF_EXTRACTION_WORKERS if workers is None else workers
+    with _process_pool_lock:
+        if _process_pool is None and workers > 0:
+            # spawn avoids forking a process that already runs server threads
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """Stop the shared extraction process pool, waiting for running work."""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> tuple:
+    """Worker entry point: parse pages ``[start, stop)`` from a memory-mapped file.
+
+    Returns the non-empty ``(page_index, text)`` pages and the parse time of
+    every page, which the parent process records as metrics.
+    """
+    from pypdf import PdfReader
+
+    with open(file_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        reader = PdfReader(buffer)
+        pages, timings = [], []
+        for i in range(start, stop):
+            started = time.perf_counter()
+            content = reader.pages[i].extract_text()
+            timings.append(time.perf_counter() - started)
+            if content:
+                pages.append((i, normalize_whitespace(content)))
+        return pages, timings
+
+
+def iter_page_text_parallel(pool, file_path: str, total_pages: int, stop: int = None):
+    """Yield the same stream as ``iter_page_text`` with pages parsed across ``pool``.
+
+    Page ranges are dispatched to the workers up front and merged back in page
+    order as they are consumed.
+    """
+    stop = total_pages if stop is None else min(stop, total_pages)
+    chunk = max(1, PDF_PARALLEL_CHUNK_PAGES)
+    futures = [
+        pool.submit(_extract_page_range, file_path, start, min(start + chunk, stop))
+        for start in range(0, stop, chunk)
+    ]
+    try:
+        for future in futures:
+            pages, timings = future.result()
+            for seconds in timings:
+                record("page_extract", "parallel", seconds)
+            yield from pages
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def select_top_pages(page_stream, limit: int) -> list:
+    """Keep the ``limit`` highest-scoring pages from a stream, in page order.
+
+    A min-heap of at most ``limit`` entries holds the current best pages; ties
+    on score favour earlier pages. ``limit <= 0`` keeps every page.
+    """
+    if limit <= 0:
+        return list(page_stream)
+
+    heap = []
+    for i, content in page_stream:
+        entry = (score_page(content.lower()), -i, content)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    return [(-neg_i, content) for _, neg_i, content in sorted(heap, key=lambda entry: -entry[1])]
+
+
+def format_pages(pages) -> str:
+    """Render extracted pages as the ``[Page N]`` report consumed by the agents."""
+    return "".join(f"[Page {i + 1}]\n{content}\n\n" for i, content in pages if content)
+
+
+def _extract_all(file_path: str) -> dict:
+    """Parse every page of a PDF (across the process pool for large documents)."""
+    from pypdf import PdfReader
+
+    with span("pdf_open"):
+        reader = PdfReader(file_path)
+        total_pages = len(reader.pages)
+
+    pool = _process_pool
+    if pool is not None and total_pages >= PDF_PARALLEL_MIN_PAGES:
+        pages = list(iter_page_text_parallel(pool, os.path.abspath(file_path), total_pages))
+    else:
+        pages = list(iter_page_text(reader))
+    return {"total_pages": total_pages, "pages": pages}
+
+
+def select_pages(extraction: dict, max_pages: int = 50, focus_sections: bool = True) -> dict:
+    """Apply the ``extract_pages`` page selection to a full extraction."""
+    total_pages = extraction["total_pages"]
+    if focus_sections and total_pages > 30:  # Only prioritize if document is large
+        # Keep the best max_pages pages by financial keyword score
+        pages = select_top_pages(iter(extraction["pages"]), max_pages)
+    else:
+        # For smaller documents or when focus_sections=False, the first max_pages pages (0 for all)
+        limit = max_pages if max_pages > 0 else total_pages
+        pages = [(i, content) for i, content in extraction["pages"] if i < limit]
+    return {"total_pages": total_pages, "pages": pages}
+
+
+def _extract_uncached(file_path: str, max_pages: int, focus_sections: bool) -> dict:
+    return select_pages(_extract_all(file_path), max_pages, focus_sections)
+
+
+def extract_pages(file_path: str, max_pages: int = 50, focus_sections: bool = True) -> dict:
+    """Extract per-page text from a PDF, reusing cached results when available.
+
+    Returns a dict with ``total_pages`` (int) and ``pages``, a list of
+    ``(page_index, text)`` tuples in page order with whitespace normalized.
+    The PDF is parsed once per file hash whatever the arguments.
+    """
+    key = extraction_cache_key(file_sha256(file_path))
+    extraction = extraction_cache.get(key)
+    if extraction is None:
+        extraction = _extract_all(file_path)
+        extraction_cache.set(key, extraction)
+    return select_pages(extraction, max_pages, focus_sections)
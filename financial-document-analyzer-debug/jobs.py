@@ -0,0 +1,201 @@
+## Importing libraries and files
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobStore:
+    """SQLite-backed store for analysis jobs and their progress events."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " query TEXT NOT NULL,"
+                " file_name TEXT,"
+                " file_path TEXT,"
+                " result TEXT,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " job_id TEXT NOT NULL,"
+                " event TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, query: str, file_name: str, file_path: str) -> str:
+        job_id = str(uuid.uuid4())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, query, file_name, file_path, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, query, file_name, file_path, time.time()),
+            )
+        self.add_event(job_id, JOB_QUEUED, {})
+        return job_id
+
+    def mark_running(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                (JOB_RUNNING, time.time(), job_id),
+            )
+        self.add_event(job_id, JOB_RUNNING, {})
+
+    def mark_finished(self, job_id: str, result: str = None, error: str = None) -> None:
+        status = JOB_FAILED if error is not None else JOB_SUCCEEDED
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+        self.add_event(job_id, status, {"error": error} if error is not None else {})
+
+    def fail_unfinished(self, reason: str) -> int:
+        """Fail jobs left queued or running by a previous process."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+        for row in rows:
+            self.mark_finished(row["id"], error=reason)
+        return len(rows)
+
+    def add_event(self, job_id: str, event: str, data: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, event, json.dumps(data), time.time()),
+            )
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def events(self, job_id: str, after_id: int = 0) -> list:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, event, data, created_at FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                (job_id, after_id),
+            ).fetchall()
+        return [
+            {"id": row["id"], "event": row["event"], "data": json.loads(row["data"]), "created_at": row["created_at"]}
+            for row in rows
+        ]
+
+
+class JobQueue:
+    """Bounded in-process job queue drained by a fixed pool of workers.
+
+    ``runner(query, file_path, on_progress, **options)`` performs the analysis in a
+    dedicated thread pool (not the default ``asyncio.to_thread`` executor) and
+    returns the result; ``on_progress(event, data)`` records progress events.
+    Submitting while ``max_queue`` jobs are already waiting raises
+    ``QueueFullError``.
+    """
+
+    def __init__(self, store: JobStore, runner, workers: int = 2, max_queue: int = 16):
+        self.store = store
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._queue = None
+        self._tasks = []
+        self._executor = None
+
+    async def start(self) -> None:
+        interrupted = await asyncio.to_thread(self.store.fail_unfinished, "Job interrupted by a server restart")
+        if interrupted:
+            print(f"Marked {interrupted} unfinished job(s) as failed")
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, job_id: str, query: str, file_path: str, cleanup: bool = True, **options) -> None:
+        """Queue a job; ``options`` are passed to the runner as keyword arguments."""
+        try:
+            self._queue.put_nowait((job_id, query, file_path, cleanup, options))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_queue} jobs waiting)")
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, query, file_path, cleanup, options = await self._queue.get()
+            try:
+                await asyncio.to_thread(self.store.mark_running, job_id)
+
+                def on_progress(event, data, job_id=job_id):
+                    self.store.add_event(job_id, event, data)
+
+                runner = functools.partial(self.runner, query, file_path, on_progress, **options)
+                result = await loop.run_in_executor(self._executor, runner)
+                await asyncio.to_thread(self.store.mark_finished, job_id, str(result))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await asyncio.to_thread(self.store.mark_finished, job_id, None, f"Error processing financial document: {str(e)}")
+            finally:
+                if cleanup:
+                    await asyncio.to_thread(_remove_file, file_path)
+                self._queue.task_done()
+
+
+def _remove_file(file_path: str) -> None:
+    if file_path and os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass  # Ignore cleanup errors
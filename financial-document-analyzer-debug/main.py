@@ -1,36 +1,309 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Response
+from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import os
-import uuid
+import json
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+load_dotenv()
 
-from crewai import Crew, Process
-from agents import financial_analyst, verifier, investment_advisor, risk_assessor
-from task import analyze_financial_document_task, investment_analysis, risk_assessment, verification
+from crew_pool import crew_pool, TASK_ORDER, EXECUTION_MODES, DEFAULT_EXECUTION_MODE
+from extraction import extraction_cache, extract_pages, start_process_pool, shutdown_process_pool
+from verification_gate import verify_document, DocumentRejectedError
+from uploads import (
+    save_upload, save_zip_upload, is_zip_upload, remove_upload, UploadError,
+    UploadGuardMiddleware, UploadLimits, UPLOAD_MAX_BYTES, UPLOAD_FORM_OVERHEAD_BYTES, BATCH_UPLOAD_MAX_BYTES,
+)
+from jobs import JobQueue, JobStore, QueueFullError, FINISHED_STATUSES
+from scheduler import crew_scheduler
+from rate_limit import rate_limit_stats
+from search import search_budget, search_stats
+from revisions import plan_incremental, revision_stats, save_revision
+from analysis_cache import analysis_cache, analysis_cache_key
+from metrics import current_trace, record, render_metrics, span, trace_request
 
-app = FastAPI(title="Financial Document Analyzer")
+DEFAULT_QUERY = "Analyze this financial document for investment insights"
 
-def run_crew(query: str, file_path: str = "data/sample.pdf"):
-    """Run the full financial analysis crew on the given document."""
-    financial_crew = Crew(
-        agents=[verifier, financial_analyst, investment_advisor, risk_assessor],
-        tasks=[verification, analyze_financial_document_task, investment_analysis, risk_assessment],
-        process=Process.sequential,
-        verbose=True,
-    )
-    
-    result = financial_crew.kickoff(inputs={'query': query, 'file_path': file_path})
+## Background job queue
+# JOB_WORKERS crews run at once; at most JOB_QUEUE_SIZE more may wait before
+# POST /jobs answers 429. Jobs and progress events persist in JOBS_DB.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "16"))
+JOBS_DB = os.environ.get("JOBS_DB", "data/jobs.sqlite3")
+
+def warm_up(state: dict) -> None:
+    """Import crewai, build the LLM and fill the crew pool, recording the outcome in ``state``."""
+    started = time.perf_counter()
+    try:
+        crew_pool.warm()
+        state["ready"] = True
+    except Exception as e:
+        # e.g. no API key: the process stays live but never reports ready
+        state["error"] = str(e)
+        print(f"Warm-up failed: {e}")
+    finally:
+        state["seconds"] = round(time.perf_counter() - started, 3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared resources once per worker process and release them on shutdown."""
+    # PDF extraction pool shared by every request (PDF_EXTRACTION_WORKERS > 0)
+    start_process_pool()
+    app.state.job_queue = JobQueue(JobStore(JOBS_DB), run_crew_scheduled, workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE)
+    await app.state.job_queue.start()
+    # Pre-build isolated crews in the background so the server accepts
+    # connections (and answers /healthz) while crewai loads; /readyz reports
+    # when the crews are built
+    app.state.warmup = {"ready": False, "error": None, "seconds": None}
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, app.state.warmup))
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        await app.state.job_queue.stop()
+        crew_scheduler.shutdown()
+        await asyncio.to_thread(shutdown_process_pool)
+
+app = FastAPI(title="Financial Document Analyzer", lifespan=lifespan)
+
+# Oversized or non-PDF uploads are cut off while the body is arriving, before
+# the form is parsed; batch entries are checked one by one after upload
+_pdf_upload = UploadLimits(UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD_BYTES, max_file=UPLOAD_MAX_BYTES, pdf_only=True)
+app.add_middleware(UploadGuardMiddleware, routes={
+    "/analyze": _pdf_upload,
+    "/jobs": _pdf_upload,
+    "/analyze-batch": UploadLimits(BATCH_UPLOAD_MAX_BYTES),
+})
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Collect each request's spans and record its latency per route."""
+    with trace_request() as trace:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        record("request", route.path if route is not None else "unmatched", trace.summary()["total_s"])
+    return response
+
+def run_crew(query: str, file_path: str = "data/sample.pdf", on_progress=None, mode: str = DEFAULT_EXECUTION_MODE,
+             gate: dict = None):
+    """Run the full financial analysis crew on the given document.
+
+    ``mode`` is one of ``EXECUTION_MODES``. ``on_progress(event, data)``, when
+    given, is called after each task completes.
+
+    ``gate`` is the result of an earlier ``verify_document`` call; without it
+    the verification gate runs first and raises ``DocumentRejectedError``
+    before any agent runs if the file is not a financial document.
+    """
+    if gate is None:
+        gate = verify_gate(file_path)
+    if on_progress is not None:
+        on_progress("verified", gate)
+
+    completed = []
+
+    def task_callback(output):
+        completed.append(output)
+        if on_progress is not None:
+            on_progress("task_completed", {
+                "agent": output.agent,
+                "summary": output.summary,
+                "completed": len(completed),
+                "total": len(TASK_ORDER),
+            })
+
+    plan = None
+    if mode == "incremental":
+        # Diff against the previous version of this filing; None means a full run
+        with span("incremental_plan"):
+            plan = plan_incremental(file_path, query)
+        if on_progress is not None:
+            on_progress("incremental_plan", plan["summary"] if plan is not None else {"full_run": True})
+
+    # One web search budget per run, shared by every agent in the crew
+    with crew_pool.acquire() as instance, span("crew", mode), search_budget():
+        result = instance.run({'query': query, 'file_path': file_path}, mode=mode, task_callback=task_callback, plan=plan)
+
+    # Keep the sections and page fingerprints so a revised filing can be analyzed incrementally
+    try:
+        save_revision(file_path, query, result)
+    except Exception as e:
+        print(f"Could not store analysis for incremental runs: {e}")
     return result
 
+def verify_gate(file_path: str) -> dict:
+    """Run the verification gate; raises ``DocumentRejectedError`` for non-financial files."""
+    with span("verification_gate"):
+        return verify_document(file_path)
+
+def run_crew_scheduled(query: str, file_path: str, on_progress=None, mode: str = DEFAULT_EXECUTION_MODE):
+    """Blocking, cached ``run_crew`` through the shared scheduler (used by job workers)."""
+    key = analysis_cache_key(file_path, query, mode)
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        if on_progress is not None:
+            on_progress("cache_hit", {"cache": "HIT"})
+        return cached
+    # Rejected files fail here, without taking a paced crew slot
+    gate = verify_gate(file_path)
+    analysis = str(crew_scheduler.run(run_crew, query, file_path, on_progress=on_progress, mode=mode, gate=gate))
+    analysis_cache.set(key, analysis)
+    return analysis
+
+async def analyze_cached(query: str, file_path: str, mode: str = DEFAULT_EXECUTION_MODE, prefetch: bool = False):
+    """Return a cached analysis, or run the crew through the shared scheduler and cache it.
+
+    Returns ``(analysis, cache_status, timing)``; ``cache_status`` is ``"HIT"``
+    or ``"MISS"`` and ``timing`` holds the verification and scheduler wait/run
+    seconds on a miss. ``prefetch`` extracts the PDF text before queueing for a
+    crew. Raises ``DocumentRejectedError`` before queueing for rejected files.
+    """
+    key = await asyncio.to_thread(analysis_cache_key, file_path, query, mode)
+    cached = await asyncio.to_thread(analysis_cache.get, key)
+    if cached is not None:
+        return cached, "HIT", {}
+    timing = {}
+    if prefetch:
+        started = time.monotonic()
+        await asyncio.to_thread(extract_pages, file_path, 50, True)
+        timing["extract_seconds"] = time.monotonic() - started
+    # Rejected files fail here, without taking a paced crew slot
+    started = time.monotonic()
+    gate = await asyncio.to_thread(verify_gate, file_path)
+    timing["verify_seconds"] = time.monotonic() - started
+    future = crew_scheduler.submit(run_crew, query, file_path, mode=mode, gate=gate)
+    analysis = str(await asyncio.wrap_future(future))
+    await asyncio.to_thread(analysis_cache.set, key, analysis)
+    return analysis, "MISS", {**timing, **future.timing}
+
+def _validate_mode(mode: str) -> str:
+    mode = (mode or DEFAULT_EXECUTION_MODE).strip().lower()
+    if mode not in EXECUTION_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode '{mode}'. Choose one of: {', '.join(EXECUTION_MODES)}")
+    return mode
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {"message": "Financial Document Analyzer API is running"}
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: 200 once the crews are built, 503 while warming up or if warm-up failed"""
+    warmup = app.state.warmup
+    if warmup["ready"]:
+        return {"status": "ready", "warmup_seconds": warmup["seconds"]}
+    status = "failed" if warmup["error"] else "starting"
+    return JSONResponse(status_code=503, content={"status": status, "error": warmup["error"]})
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Extraction, analysis and web search cache hit/miss counters"""
+    return {"extraction": extraction_cache.stats(), "analysis": analysis_cache.stats(), "search": search_stats()}
+
+@app.get("/crew/stats")
+async def crew_stats():
+    """Crew pool size, per-request setup latency, scheduler load and incremental re-analysis counters"""
+    incremental = await asyncio.to_thread(revision_stats)
+    return {**crew_pool.stats(), "scheduler": crew_scheduler.stats(), "incremental": incremental}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms and token counters in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Shared LLM rate limiter budget, queue-wait time and coalesced calls"""
+    return await asyncio.to_thread(rate_limit_stats)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    query: str = Form(default=DEFAULT_QUERY),
+    mode: str = Form(default=DEFAULT_EXECUTION_MODE)
+):
+    """Queue a financial document for background analysis and return its job id"""
+    mode = _validate_mode(mode)
+    job_queue = app.state.job_queue
+    if job_queue.depth() >= job_queue.max_queue:
+        raise HTTPException(status_code=429, detail="Job queue is full, retry later", headers={"Retry-After": "30"})
+
+    query = query.strip() or DEFAULT_QUERY
+    try:
+        upload = await save_upload(file)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    file_path = upload.path
+    job_id = await asyncio.to_thread(job_queue.store.create, query, file.filename, file_path)
+    try:
+        job_queue.submit(job_id, query, file_path, mode=mode)
+    except QueueFullError as e:
+        await asyncio.to_thread(job_queue.store.mark_finished, job_id, None, str(e))
+        await remove_upload(file_path)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "mode": mode,
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Return the status of a background job and its analysis once finished"""
+    job = await asyncio.to_thread(app.state.job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "query": job["query"],
+        "file_processed": job["file_name"],
+        "analysis": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream job progress as server-sent events until the job finishes"""
+    store = app.state.job_queue.store
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    async def event_stream():
+        last_id = 0
+        while True:
+            for event in await asyncio.to_thread(store.events, job_id, last_id):
+                last_id = event["id"]
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                if event["event"] in FINISHED_STATUSES:
+                    return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.post("/analyze-sample")
 async def analyze_sample_document(
-    query: str = Form(default="Analyze this financial document for investment insights")
+    response: Response,
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    mode: str = Form(default=DEFAULT_EXECUTION_MODE),
+    timings: bool = Form(default=False)
 ):
     """Analyze the sample TSLA document (for testing without file upload)"""
+    mode = _validate_mode(mode)
     sample_file_path = "data/TSLA-Q2-2025-Update.pdf"
     
     if not os.path.exists(sample_file_path):
@@ -38,71 +311,165 @@ async def analyze_sample_document(
     
     try:
         absolute_file_path = os.path.abspath(sample_file_path)
-        response = await asyncio.to_thread(run_crew, query.strip(), absolute_file_path)
+        analysis, cache_status, _ = await analyze_cached(query.strip(), absolute_file_path, mode=mode)
+        response.headers["X-Cache"] = cache_status
         
-        return {
+        result = {
             "status": "success",
             "query": query,
-            "analysis": str(response),
+            "mode": mode,
+            "analysis": analysis,
             "file_processed": "TSLA-Q2-2025-Update.pdf"
         }
+        if timings:
+            result["timings"] = current_trace().summary()
+        return result
+    except DocumentRejectedError as e:
+        raise HTTPException(status_code=422, detail=f"Document rejected: {e.reason}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing financial document: {str(e)}")
 
 @app.post("/analyze")
 async def analyze_document(
+    response: Response,
     file: UploadFile = File(...),
-    query: str = Form(default="Analyze this financial document for investment insights")
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    mode: str = Form(default=DEFAULT_EXECUTION_MODE),
+    timings: bool = Form(default=False)
 ):
     """Analyze financial document and provide comprehensive investment recommendations"""
+    mode = _validate_mode(mode)
     
-    file_id = str(uuid.uuid4())
-    file_path = f"data/financial_document_{file_id}.pdf"
+    file_path = None
     
     try:
-        # Ensure data directory exists
-        os.makedirs("data", exist_ok=True)
-        
-        # Save uploaded file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Stream the upload to disk (size-capped, PDF-validated, hashed on the way)
+        upload = await save_upload(file)
+        file_path = upload.path
         
         # Validate query
         if query == "" or query is None:
             query = "Analyze this financial document for investment insights"
         
-        # Verify file exists before processing
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=400, detail=f"File was not saved correctly. Expected at: {file_path}")
-        
         # Log the file path for debugging
         print(f"Processing file: {file_path}")
-        print(f"File exists: {os.path.exists(file_path)}")
-        print(f"File size: {os.path.getsize(file_path) if os.path.exists(file_path) else 'N/A'} bytes")
+        print(f"File size: {upload.size} bytes, sha256: {upload.sha256}")
             
         # Process the financial document with all analysts
-        # Pass absolute path to ensure agents can find it
-        absolute_file_path = os.path.abspath(file_path)
-        response = await asyncio.to_thread(run_crew, query.strip(), absolute_file_path)
+        analysis, cache_status, _ = await analyze_cached(query.strip(), file_path, mode=mode)
+        response.headers["X-Cache"] = cache_status
         
-        return {
+        result = {
             "status": "success",
             "query": query,
-            "analysis": str(response),
+            "mode": mode,
+            "analysis": analysis,
             "file_processed": file.filename
         }
+        if timings:
+            # Per-stage breakdown of this request (upload, extraction, tasks, tools, LLM calls)
+            result["timings"] = current_trace().summary()
+        return result
         
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except DocumentRejectedError as e:
+        raise HTTPException(status_code=422, detail=f"Document rejected: {e.reason}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing financial document: {str(e)}")
     
     finally:
-        # Clean up uploaded file
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except:
-                pass  # Ignore cleanup errors
+        # Clean up uploaded file off the event loop
+        if file_path:
+            await remove_upload(file_path)
+
+async def _save_batch_files(files) -> list:
+    """Save every uploaded file (unpacking zips); returns ``(name, SavedUpload or UploadError)`` pairs."""
+    saved = []
+    for file in files:
+        try:
+            if is_zip_upload(file):
+                saved.extend(await save_zip_upload(file))
+            else:
+                saved.append((file.filename, await save_upload(file)))
+        except UploadError as e:
+            saved.append((file.filename, e))
+    return saved
+
+@app.post("/analyze-batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    query: str = Form(default=DEFAULT_QUERY),
+    mode: str = Form(default=DEFAULT_EXECUTION_MODE)
+):
+    """Analyze many financial documents (PDFs or zip archives of PDFs) in one request.
+
+    Streams one NDJSON line per document as soon as its analysis finishes,
+    then a summary line. Identical files are analyzed once.
+    """
+    mode = _validate_mode(mode)
+    query = query.strip() or DEFAULT_QUERY
+    started = time.monotonic()
+    saved = await _save_batch_files(files)
+
+    # Deduplicate by content hash; duplicates share the first copy's result
+    errors, unique = [], {}
+    for name, upload in saved:
+        if isinstance(upload, UploadError):
+            errors.append({"file": name, "status": "error", "status_code": upload.status_code, "error": upload.detail})
+        elif upload.sha256 in unique:
+            unique[upload.sha256]["duplicates"].append(name)
+            await remove_upload(upload.path)
+        else:
+            unique[upload.sha256] = {"file": name, "upload": upload, "duplicates": []}
+
+    async def analyze_one(entry):
+        upload = entry["upload"]
+        line = {"file": entry["file"], "duplicates": entry["duplicates"], "sha256": upload.sha256}
+        doc_started = time.monotonic()
+        try:
+            # Extraction runs for every document at once; the crews then queue on the scheduler
+            analysis, cache_status, timing = await analyze_cached(query, upload.path, mode=mode, prefetch=True)
+            line.update(status="success", cache=cache_status, analysis=analysis)
+            line["timings"] = {
+                f"{name.replace('_seconds', '')}_s": round(seconds, 3) for name, seconds in timing.items()
+            }
+        except DocumentRejectedError as e:
+            line.update(status="rejected", error=f"Document rejected: {e.reason}")
+        except Exception as e:
+            line.update(status="error", error=f"Error processing financial document: {str(e)}")
+        finally:
+            await remove_upload(upload.path)
+        line.setdefault("timings", {})["total_s"] = round(time.monotonic() - doc_started, 3)
+        return line
+
+    async def result_stream():
+        succeeded = 0
+        for line in errors:
+            yield json.dumps(line) + "\n"
+        pending = [asyncio.ensure_future(analyze_one(entry)) for entry in unique.values()]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                line = await next_done
+                succeeded += line["status"] == "success"
+                yield json.dumps(line) + "\n"
+        finally:
+            for task in pending:
+                task.cancel()
+        wall = time.monotonic() - started
+        documents = len(saved)
+        yield json.dumps({
+            "summary": True,
+            "mode": mode,
+            "documents": documents,
+            "unique": len(unique),
+            "succeeded": succeeded,
+            "failed": len(errors) + len(unique) - succeeded,
+            "wall_s": round(wall, 3),
+            "docs_per_minute": round(len(unique) * 60 / wall, 2) if wall > 0 else None,
+        }) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
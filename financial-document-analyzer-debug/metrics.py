@@ -0,0 +1,184 @@
+## Importing libraries and files
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+## Latency metrics
+# Every instrumented stage (upload, PDF open, page extraction, crew task, tool
+# call, LLM call) records a span. Spans feed process-wide Prometheus histograms
+# served at /metrics and, when a request is being traced, that request's own
+# timing breakdown.
+
+# Seconds; spans range from sub-millisecond page parses to multi-minute crew runs
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Prometheus histogram with cumulative buckets, one series per label combination."""
+
+    def __init__(self, name: str, documentation: str, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    bucket_labels = _labels(self.label_names, label_values, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                bucket_labels = _labels(self.label_names, label_values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {series['count']}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter, one series per label combination."""
+
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values) -> None:
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, label_values)} {value:g}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "fda_stage_duration_seconds",
+    "Time spent in each instrumented stage of an analysis.",
+    ("stage", "name"),
+)
+stage_tokens = Counter(
+    "fda_stage_tokens_total",
+    "Estimated LLM tokens handled by each stage, by kind (prompt or completion).",
+    ("stage", "name", "kind"),
+)
+REGISTRY = [stage_seconds, stage_tokens]
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+## Per-request traces
+class RequestTrace:
+    """Spans recorded while handling one request, summarized per stage."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, name: str, seconds: float, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.spans.append((stage, name, seconds, prompt_tokens, completion_tokens))
+
+    def summary(self) -> dict:
+        """Count, total seconds and tokens per stage, plus the request's wall time."""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for stage, name, seconds, prompt_tokens, completion_tokens in spans:
+            entry = stages.setdefault(stage, {"count": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+        for entry in stages.values():
+            entry["seconds"] = round(entry["seconds"], 4)
+        return {"total_s": round(time.perf_counter() - self.started, 4), "stages": stages}
+
+
+# Context variables follow asyncio tasks and asyncio.to_thread; code that hands
+# work to other executors copies the context explicitly
+_current_trace = contextvars.ContextVar("request_trace", default=None)
+
+
+@contextmanager
+def trace_request():
+    """Collect every span recorded in this context into a ``RequestTrace``."""
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    """The ``RequestTrace`` of the request being handled, or None."""
+    return _current_trace.get()
+
+
+def record(stage: str, name: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+    """Record one finished span in the histograms and the current request trace."""
+    stage_seconds.observe(seconds, stage, name)
+    if prompt_tokens:
+        stage_tokens.inc(prompt_tokens, stage, name, "prompt")
+    if completion_tokens:
+        stage_tokens.inc(completion_tokens, stage, name, "completion")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, name, seconds, prompt_tokens, completion_tokens)
+
+
+@contextmanager
+def span(stage: str, name: str = ""):
+    """Time the enclosed block as one ``stage`` span.
+
+    Yields a dict in which the block may set ``prompt_tokens`` and
+    ``completion_tokens``.
+    """
+    tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+    started = time.perf_counter()
+    try:
+        yield tokens
+    finally:
+        record(stage, name, time.perf_counter() - started, tokens["prompt_tokens"], tokens["completion_tokens"])
@@ -0,0 +1,214 @@
+## Importing libraries and files
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from cache import SingleFlight
+from metrics import span
+from retrieval import estimate_tokens
+
+## LLM rate limits
+# One request bucket and one token bucket per model, refilled continuously at
+# LLM_RPM requests and LLM_TPM tokens per minute. Buckets live in RATE_LIMIT_DB
+# so every uvicorn worker process draws from the same budget. A limit <= 0
+# disables that bucket.
+LLM_RPM = float(os.environ.get("LLM_RPM", "30"))
+LLM_TPM = float(os.environ.get("LLM_TPM", "8000"))
+RATE_LIMIT_DB = os.environ.get("RATE_LIMIT_DB", "data/rate_limit.sqlite3")
+# Completion tokens reserved per call until the real response size is known
+LLM_COMPLETION_RESERVE_TOKENS = int(os.environ.get("LLM_COMPLETION_RESERVE_TOKENS", "1000"))
+
+
+class ProviderRateLimiter:
+    """Token-bucket limiter on requests and tokens per minute for one model, shared through SQLite."""
+
+    def __init__(self, model: str, rpm: float = LLM_RPM, tpm: float = LLM_TPM, db_path: str = RATE_LIMIT_DB):
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._waited_calls = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                " name TEXT PRIMARY KEY,"
+                " level REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the database write lock, so read-refill-debit is
+        # atomic across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def _buckets(self, tokens: float) -> list:
+        """``(bucket name, capacity per minute, amount)`` for each enabled bucket."""
+        buckets = []
+        if self.rpm > 0:
+            buckets.append((f"{self.model}:requests", self.rpm, 1))
+        if self.tpm > 0:
+            # A prompt larger than the whole budget waits for a full bucket
+            buckets.append((f"{self.model}:tokens", self.tpm, min(tokens, self.tpm)))
+        return buckets
+
+    @staticmethod
+    def _level(conn, name: str, capacity: float, now: float) -> float:
+        row = conn.execute("SELECT level, updated_at FROM rate_buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return capacity
+        level, updated_at = row
+        return min(capacity, level + max(0.0, now - updated_at) * capacity / 60)
+
+    def _try_acquire(self, tokens: float) -> float:
+        """Debit every bucket and return 0, or return the seconds until they would all fit."""
+        buckets = self._buckets(tokens)
+        if not buckets:
+            return 0.0
+        now = time.time()
+        with self._transaction() as conn:
+            levels = [self._level(conn, name, capacity, now) for name, capacity, _ in buckets]
+            waits = [
+                (amount - level) * 60 / capacity
+                for (_, capacity, amount), level in zip(buckets, levels)
+                if level < amount
+            ]
+            if waits:
+                return max(waits)
+            for (name, _, amount), level in zip(buckets, levels):
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                    (name, level - amount, now),
+                )
+        return 0.0
+
+    def acquire(self, tokens: float) -> float:
+        """Block until one request and ``tokens`` tokens are available; returns the seconds waited."""
+        started = time.monotonic()
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                break
+            time.sleep(min(wait, 5.0) + 0.01)
+        waited = time.monotonic() - started
+        with self._lock:
+            self._calls += 1
+            self._wait_seconds += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+            if waited >= 0.01:
+                self._waited_calls += 1
+        return waited
+
+    def settle(self, reserved: float, used: float) -> None:
+        """Correct the token bucket once a call's real size is known.
+
+        The difference is debited or refunded; the level may go negative, which
+        makes later callers wait until the overdraft has refilled.
+        """
+        if self.tpm <= 0 or used == reserved:
+            return
+        name = f"{self.model}:tokens"
+        now = time.time()
+        with self._transaction() as conn:
+            level = self._level(conn, name, self.tpm, now) - (used - reserved)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                (name, max(level, -self.tpm), now),
+            )
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._transaction() as conn:
+            levels = {name: round(self._level(conn, name, capacity, now), 1) for name, capacity, _ in self._buckets(0)}
+        with self._lock:
+            return {
+                "model": self.model,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "available": levels,
+                "calls": self._calls,
+                "waited_calls": self._waited_calls,
+                "avg_wait_ms": round(self._wait_seconds / self._calls * 1000, 1) if self._calls else 0.0,
+                "max_wait_ms": round(self._max_wait_seconds * 1000, 1),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# Identical prompts in flight at the same time share one provider call
+llm_calls = SingleFlight("llm_calls")
+
+
+def get_rate_limiter(model: str) -> ProviderRateLimiter:
+    """Return the process-wide limiter for ``model``."""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = ProviderRateLimiter(model)
+        return limiter
+
+
+def rate_limit_stats() -> dict:
+    """Queue-wait and remaining budget for every model used so far, plus coalescing counters."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {"models": [limiter.stats() for limiter in limiters], "coalescing": llm_calls.stats()}
+
+
+def _message_tokens(messages) -> int:
+    if isinstance(messages, str):
+        return estimate_tokens(messages)
+    return sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+
+
+def prompt_key(model: str, messages, tools=None) -> str:
+    payload = json.dumps({"model": model, "messages": messages, "tools": tools}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def rate_limited_call(model: str, messages, tools, provider_call, coalesce: bool = True):
+    """Run ``provider_call()`` under ``model``'s shared limiter and return its response.
+
+    Queue wait and the call itself are recorded as ``llm_queue`` and ``llm``
+    spans. With ``coalesce``, identical prompts already in flight share one
+    provider call.
+    """
+    def limited_call():
+        limiter = get_rate_limiter(model)
+        prompt_tokens = _message_tokens(messages)
+        reserved = prompt_tokens + LLM_COMPLETION_RESERVE_TOKENS
+        with span("llm_queue", model):
+            limiter.acquire(reserved)
+        with span("llm", model) as tokens:
+            response = provider_call()
+            tokens["prompt_tokens"] = prompt_tokens
+            tokens["completion_tokens"] = estimate_tokens(str(response))
+        limiter.settle(reserved, prompt_tokens + tokens["completion_tokens"])
+        return response
+
+    if not coalesce:
+        return limited_call()
+    return llm_calls.do(prompt_key(model, messages, tools), limited_call)
@@ -0,0 +1,171 @@
+## Importing libraries and files
+import math
+import os
+import re
+from collections import Counter
+
+from cache import TieredCache, file_sha256
+from extraction import extract_pages, financial_keywords, score_page
+
+## Retrieval settings
+# Documents are split into chunks of about RETRIEVAL_CHUNK_TOKENS tokens and
+# indexed with BM25 once per document. read_data_tool then returns the best
+# chunks for the query, packed into READ_TOKEN_BUDGET tokens; calls without a
+# query get the highest-scoring whole pages within the same budget.
+RETRIEVAL_CHUNK_TOKENS = int(os.environ.get("RETRIEVAL_CHUNK_TOKENS", "300"))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "24"))
+READ_TOKEN_BUDGET = int(os.environ.get("READ_TOKEN_BUDGET", "3000"))
+# Weight of the financial keyword expansion relative to the user's query terms
+KEYWORD_EXPANSION_WEIGHT = 0.3
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+index_cache = TieredCache(
+    name="retrieval",
+    max_entries=int(os.environ.get("RETRIEVAL_CACHE_SIZE", "32")),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall(text.lower())
+
+
+def chunk_pages(pages, chunk_tokens: int = RETRIEVAL_CHUNK_TOKENS) -> list:
+    """Split ``(page_index, text)`` pages into line-aligned chunks of about ``chunk_tokens``.
+
+    Chunks never span pages, so every chunk can be cited by page number.
+    """
+    chunks = []
+    for page_index, content in pages:
+        lines, size = [], 0
+        for line in content.split("\n"):
+            line_tokens = estimate_tokens(line)
+            if lines and size + line_tokens > chunk_tokens:
+                chunks.append({"page": page_index, "text": "\n".join(lines)})
+                lines, size = [], 0
+            lines.append(line)
+            size += line_tokens
+        if lines:
+            chunks.append({"page": page_index, "text": "\n".join(lines)})
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks."""
+
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        self.lengths = [sum(freqs.values()) for freqs in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter()
+        for freqs in self.term_freqs:
+            doc_freq.update(freqs.keys())
+        total = len(chunks)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def search(self, weighted_terms: dict, top_k: int) -> list:
+        """Return ``(score, chunk_index)`` pairs for the ``top_k`` best chunks."""
+        terms = {term: weight for term, weight in weighted_terms.items() if term in self.idf}
+        if not terms:
+            return []
+        scores = []
+        for i, freqs in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term, weight in terms.items():
+                tf = freqs.get(term)
+                if tf:
+                    score += weight * self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((score, i))
+        scores.sort(key=lambda pair: (-pair[0], pair[1]))
+        return scores[:top_k]
+
+
+def get_index(file_path: str, chunk_tokens: int = RETRIEVAL_CHUNK_TOKENS):
+    """Return ``(index, total_pages)`` for a document, building the index once per file hash."""
+    key = f"{file_sha256(file_path)}:chunk_tokens={chunk_tokens}"
+    cached = index_cache.get(key)
+    if cached is not None:
+        return cached
+
+    extraction = extract_pages(file_path, max_pages=0, focus_sections=False)
+    cached = (BM25Index(chunk_pages(extraction["pages"], chunk_tokens)), extraction["total_pages"])
+    index_cache.set(key, cached)
+    return cached
+
+
+def query_terms(query: str) -> dict:
+    """Weight the user's query terms, expanded with the financial keyword list."""
+    weighted = {}
+    for keyword in financial_keywords:
+        for term in tokenize(keyword):
+            weighted[term] = KEYWORD_EXPANSION_WEIGHT
+    for term in tokenize(query):
+        weighted[term] = 1.0
+    return weighted
+
+
+def retrieve(file_path: str, query: str, token_budget: int = READ_TOKEN_BUDGET, top_k: int = RETRIEVAL_TOP_K) -> dict:
+    """Pick the chunks most relevant to ``query`` that fit in ``token_budget`` tokens.
+
+    Returns ``total_pages``, the selected ``chunks`` in document order and the
+    estimated ``tokens`` they use.
+    """
+    index, total_pages = get_index(file_path)
+    selected, used = [], 0
+    for _, i in index.search(query_terms(query), top_k):
+        chunk = index.chunks[i]
+        cost = estimate_tokens(chunk["text"])
+        if used + cost > token_budget:
+            continue
+        selected.append(i)
+        used += cost
+    return {
+        "total_pages": total_pages,
+        "chunks": [index.chunks[i] for i in sorted(selected)],
+        "tokens": used,
+    }
+
+
+def pack_pages(pages, token_budget: int = READ_TOKEN_BUDGET) -> tuple:
+    """Keep the highest-scoring pages that fit in ``token_budget`` tokens, in page order.
+
+    Used when read_data_tool has no query to retrieve for. A single page larger
+    than the budget is cut to fit. Returns ``(pages, tokens)``.
+    """
+    ranked = sorted(pages, key=lambda page: (-score_page(page[1].lower()), page[0]))
+    selected, used = [], 0
+    for i, content in ranked:
+        cost = estimate_tokens(content)
+        if used + cost > token_budget:
+            if selected:
+                continue
+            content = content[:token_budget * 4]
+            cost = estimate_tokens(content)
+        selected.append((i, content))
+        used += cost
+    return sorted(selected), used
+
+
+def format_chunks(chunks) -> str:
+    """Render retrieved chunks with ``[Page N]`` markers, merging consecutive chunks of a page."""
+    parts = []
+    last_page = None
+    for chunk in chunks:
+        if chunk["page"] != last_page:
+            parts.append(f"[Page {chunk['page'] + 1}]\n")
+            last_page = chunk["page"]
+        parts.append(f"{chunk['text']}\n\n")
+    return "".join(parts)
@@ -0,0 +1,251 @@
+## Importing libraries and files
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from analysis_cache import normalize_query
+from cache import file_sha256
+from crew_pool import SECTION_TOPICS, TASK_ORDER
+from extraction import extract_pages, format_pages
+from retrieval import estimate_tokens
+from statements import TABLE_ROW
+
+## Incremental re-analysis
+# Every finished analysis is stored with a fingerprint of each page and the
+# report sections that page feeds. When a revised version of a filing (an
+# amended 10-Q, a restated quarter) is analyzed in incremental mode, the stored
+# version sharing the most pages is its previous version: pages are diffed by
+# fingerprint and only the sections tied to added, changed or removed pages are
+# regenerated, from those pages; the other sections are reused as they were.
+REVISIONS_DB = os.environ.get("REVISIONS_DB", "data/revisions.sqlite3")
+# Stored analyses kept (oldest dropped first)
+REVISIONS_MAX = int(os.environ.get("REVISIONS_MAX", "256"))
+# Above this fraction of changed pages the filing is analyzed from scratch
+INCREMENTAL_MAX_CHANGED = float(os.environ.get("INCREMENTAL_MAX_CHANGED", "0.5"))
+# Tokens of changed page text handed to each regenerated section
+INCREMENTAL_CHANGED_TOKENS = int(os.environ.get("INCREMENTAL_CHANGED_TOKENS", "3000"))
+
+# Running headers/footers such as "Page 7" or "7 of 120" shift when pages are
+# inserted, so they are left out of the fingerprint
+_PAGE_NUMBER_LINE = re.compile(r"^\s*(?:page\s+)?\d+(?:\s+of\s+\d+)?\s*$", re.IGNORECASE)
+
+
+def page_fingerprint(text: str) -> str:
+    """SHA-256 of a page's text without page-number lines and whitespace differences."""
+    lines = [" ".join(line.split()) for line in text.splitlines() if not _PAGE_NUMBER_LINE.match(line)]
+    return hashlib.sha256("\n".join(line for line in lines if line).encode("utf-8")).hexdigest()
+
+
+def page_sections(page_index: int, text: str) -> list:
+    """Report sections (task names, in ``TASK_ORDER``) built from this page."""
+    lower = text.lower()
+    sections = {name for name, topics in SECTION_TOPICS.items() if any(topic in lower for topic in topics)}
+    if page_index < 2:
+        # Cover pages carry the company, period and document type
+        sections.add("verification")
+    if any(TABLE_ROW.match(line.strip()) for line in text.splitlines()):
+        # Statement figures feed every analysis section
+        sections.update(name for name in TASK_ORDER if name != "verification")
+    return [name for name in TASK_ORDER if name in sections]
+
+
+def fingerprint_pages(file_path: str) -> list:
+    """``(page_index, fingerprint, sections, text)`` for every page with text."""
+    extraction = extract_pages(file_path, max_pages=0, focus_sections=False)
+    return [(i, page_fingerprint(text), page_sections(i, text), text) for i, text in extraction["pages"]]
+
+
+class RevisionStore:
+    """SQLite store of finished analyses, their report sections and page fingerprints."""
+
+    def __init__(self, db_path: str, max_revisions: int = REVISIONS_MAX):
+        self.db_path = db_path
+        self.max_revisions = max(1, max_revisions)
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revisions ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " query_key TEXT NOT NULL,"
+                " file_sha256 TEXT NOT NULL,"
+                " pages TEXT NOT NULL,"
+                " sections TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revision_pages ("
+                " revision_id INTEGER NOT NULL,"
+                " page_hash TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS revision_pages_hash ON revision_pages (page_hash)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, query_key: str, file_hash: str, pages: list, sections: dict) -> int:
+        """Store an analysis; ``pages`` is a list of ``[fingerprint, sections]`` pairs."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO revisions (query_key, file_sha256, pages, sections, created_at) VALUES (?, ?, ?, ?, ?)",
+                (query_key, file_hash, json.dumps(pages), json.dumps(sections), time.time()),
+            )
+            revision_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO revision_pages (revision_id, page_hash) VALUES (?, ?)",
+                [(revision_id, page_hash) for page_hash in {page_hash for page_hash, _ in pages}],
+            )
+            conn.execute(
+                "DELETE FROM revisions WHERE id NOT IN (SELECT id FROM revisions ORDER BY id DESC LIMIT ?)",
+                (self.max_revisions,),
+            )
+            conn.execute("DELETE FROM revision_pages WHERE revision_id NOT IN (SELECT id FROM revisions)")
+        return revision_id
+
+    def find_previous(self, query_key: str, page_hashes: list):
+        """The stored analysis for ``query_key`` sharing the most pages, with its shared page count."""
+        hashes = sorted(set(page_hashes))
+        if not hashes:
+            return None
+        placeholders = ",".join("?" * len(hashes))
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT r.id, r.file_sha256, r.pages, r.sections, COUNT(*) AS shared"
+                " FROM revision_pages p JOIN revisions r ON r.id = p.revision_id"
+                f" WHERE r.query_key = ? AND p.page_hash IN ({placeholders})"
+                " GROUP BY r.id ORDER BY shared DESC, r.id DESC LIMIT 1",
+                (query_key, *hashes),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "file_sha256": row["file_sha256"],
+            "pages": json.loads(row["pages"]),
+            "sections": json.loads(row["sections"]),
+            "shared": row["shared"],
+        }
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM revisions").fetchone()[0]
+
+
+revision_store = RevisionStore(REVISIONS_DB)
+
+_stats = {"planned": 0, "full_runs": 0, "sections_reused": 0, "sections_regenerated": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**increments) -> None:
+    with _stats_lock:
+        for name, amount in increments.items():
+            _stats[name] += amount
+
+
+def revision_query_key(query: str) -> str:
+    from agents import get_llm
+    return f"{get_llm().model}:{normalize_query(query)}"
+
+
+def _changed_text(changed: list, total_pages: int, removed: int, budget: int = INCREMENTAL_CHANGED_TOKENS) -> str:
+    """Text of the changed pages for one section, within ``budget`` tokens."""
+    header = f"{len(changed)} of {total_pages} pages added or changed"
+    if removed:
+        header += f"; {removed} page(s) of the previous version were removed"
+    kept, used = [], 0
+    for page_index, text in changed:
+        cost = estimate_tokens(text)
+        if kept and used + cost > budget:
+            header += f". Showing {len(kept)} of them; the rest are cut short"
+            break
+        kept.append((page_index, text))
+        used += cost
+    return f"{header}.\n\n{format_pages(kept)}".strip()
+
+
+def plan_incremental(file_path: str, query: str):
+    """Decide which report sections to regenerate for a revised filing.
+
+    Returns None when the document should be analyzed from scratch (no
+    previous version, or more than ``INCREMENTAL_MAX_CHANGED`` of its pages
+    changed). Otherwise returns a dict with ``regenerate`` (task names),
+    ``previous_sections`` (section text by task name), ``changed_text``
+    (changed pages per regenerated section) and a JSON-friendly ``summary``.
+    """
+    pages = fingerprint_pages(file_path)
+    previous = revision_store.find_previous(revision_query_key(query), [page_hash for _, page_hash, _, _ in pages])
+    if previous is None or set(previous["sections"]) != set(TASK_ORDER):
+        print("Incremental analysis: no previous version found, running the full analysis")
+        _count(full_runs=1)
+        return None
+
+    previous_hashes = {page_hash for page_hash, _ in previous["pages"]}
+    current_hashes = {page_hash for _, page_hash, _, _ in pages}
+    changed = [(i, sections, text) for i, page_hash, sections, text in pages if page_hash not in previous_hashes]
+    # Sections of replaced or deleted pages count too: content taken out of a
+    # page can change a section as much as content added to one
+    removed = [sections for page_hash, sections in previous["pages"] if page_hash not in current_hashes]
+    removed_pages = max(0, len(removed) - len(changed))
+    changed_fraction = max(len(changed), len(removed)) / max(1, len(pages), len(previous["pages"]))
+    if changed_fraction > INCREMENTAL_MAX_CHANGED:
+        print(f"Incremental analysis: {changed_fraction:.0%} of pages changed, running the full analysis")
+        _count(full_runs=1)
+        return None
+
+    regenerate = [
+        name for name in TASK_ORDER
+        if any(name in sections for _, sections, _ in changed) or any(name in sections for sections in removed)
+    ]
+    changed_text = {
+        name: _changed_text(
+            [(i, text) for i, sections, text in changed if name in sections], len(pages), removed_pages
+        )
+        for name in regenerate
+    }
+    summary = {
+        "previous_revision": previous["id"],
+        "changed_pages": [i + 1 for i, _, _ in changed],
+        "removed_pages": removed_pages,
+        "regenerated": regenerate,
+        "reused": [name for name in TASK_ORDER if name not in regenerate],
+    }
+    print(f"Incremental analysis: {summary}")
+    _count(planned=1, sections_reused=len(summary["reused"]), sections_regenerated=len(regenerate))
+    return {
+        "regenerate": regenerate,
+        "previous_sections": previous["sections"],
+        "changed_text": changed_text,
+        "summary": summary,
+    }
+
+
+def save_revision(file_path: str, query: str, result) -> None:
+    """Store a finished crew result's sections with the document's page fingerprints."""
+    task_outputs = getattr(result, "tasks_output", None) or []
+    if len(task_outputs) != len(TASK_ORDER):
+        return
+    sections = {name: output.raw for name, output in zip(TASK_ORDER, task_outputs)}
+    pages = [[page_hash, sections_for_page] for _, page_hash, sections_for_page, _ in fingerprint_pages(file_path)]
+    revision_store.save(revision_query_key(query), file_sha256(file_path), pages, sections)
+
+
+def revision_stats() -> dict:
+    """Stored analyses and how incremental runs split between reused and regenerated sections."""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {**stats, "stored": revision_store.count(), "max_stored": revision_store.max_revisions}
@@ -0,0 +1,107 @@
+## Importing libraries and files
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CrewScheduler:
+    """Shared scheduler for crew runs across /analyze, /jobs and /analyze-batch.
+
+    At most ``max_concurrency`` crews run at once, and run starts are spaced so
+    no more than ``runs_per_minute`` begin in any minute, which keeps the burst
+    of LLM calls from a large batch inside the provider's rate limits.
+    ``runs_per_minute <= 0`` disables pacing.
+    """
+
+    def __init__(self, max_concurrency: int = 4, runs_per_minute: float = 0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.runs_per_minute = runs_per_minute
+        self._executor = None
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._wait_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="crew-run")
+            return self._executor
+
+    def _wait_for_start_slot(self) -> None:
+        if self.runs_per_minute <= 0:
+            return
+        interval = 60.0 / self.runs_per_minute
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + interval
+        delay = start_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule ``fn(*args, **kwargs)`` and return its ``concurrent.futures.Future``.
+
+        The future carries a ``timing`` dict with ``wait_seconds`` (queueing and
+        pacing) and ``run_seconds`` once the call has finished.
+        """
+        timing = {}
+        submitted = time.monotonic()
+
+        def call():
+            self._wait_for_start_slot()
+            started = time.monotonic()
+            timing["wait_seconds"] = started - submitted
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_seconds += timing["wait_seconds"]
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timing["run_seconds"] = time.monotonic() - started
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        with self._lock:
+            self._queued += 1
+        # Carry the caller's context (request trace) into the worker thread
+        context = contextvars.copy_context()
+        future = self._get_executor().submit(context.run, call)
+        future.timing = timing
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Blocking form of ``submit`` for callers already on a worker thread."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "runs_per_minute": self.runs_per_minute,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "avg_wait_ms": round(self._wait_seconds / self._completed * 1000, 1) if self._completed else 0.0,
+            }
+
+
+# CREW_MAX_CONCURRENCY defaults to the crew pool size so runs never wait on a crew;
+# CREW_RUNS_PER_MINUTE paces run starts (0 disables pacing)
+crew_scheduler = CrewScheduler(
+    max_concurrency=int(os.environ.get("CREW_MAX_CONCURRENCY", os.environ.get("CREW_POOL_SIZE", "4"))),
+    runs_per_minute=float(os.environ.get("CREW_RUNS_PER_MINUTE", "6")),
+)
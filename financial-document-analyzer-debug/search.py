@@ -0,0 +1,218 @@
+## Importing libraries and files
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from cache import SingleFlight, TieredCache
+from metrics import span
+
+## Web search
+# The analyst and advisor agents both look up market context, and for the same
+# company they ask near-identical questions within one run and across runs.
+# Lookups are keyed by a normalized query, cached for SEARCH_CACHE_TTL seconds,
+# coalesced while in flight and capped at SEARCH_MAX_CALLS_PER_RUN backend
+# calls per crew run. SEARCH_BACKEND selects where results come from:
+#   serper  - Google results through Serper (needs SERPER_API_KEY)
+#   fixture - canned results from the SEARCH_FIXTURES JSON file, for offline runs
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "serper").strip().lower()
+SEARCH_FIXTURES = os.environ.get("SEARCH_FIXTURES", "")
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", str(6 * 60 * 60)))
+# Backend lookups allowed per crew run (0 for no cap); cache hits are free
+SEARCH_MAX_CALLS_PER_RUN = int(os.environ.get("SEARCH_MAX_CALLS_PER_RUN", "4"))
+# Organic results handed to the agent per lookup
+SEARCH_RESULTS = int(os.environ.get("SEARCH_RESULTS", "5"))
+
+search_cache = TieredCache(
+    name="search",
+    max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", "256")),
+    db_path=os.environ.get("SEARCH_CACHE_DB", "data/search_cache.sqlite3") or None,
+    max_disk_entries=int(os.environ.get("SEARCH_CACHE_DISK_SIZE", "2048")),
+    ttl_seconds=SEARCH_CACHE_TTL,
+)
+search_calls = SingleFlight("search_calls")
+
+# Filler words that change the phrasing of a query but not its topic; words
+# such as "market" or "comparison" name what is searched for and stay in the key
+_STOP_WORDS = frozenset(
+    "a an and about are as at be by does for from how in is it its of on or the their this to was what "
+    "which with".split()
+)
+_WORD = re.compile(r"[a-z0-9][a-z0-9&.'-]*")
+
+
+def normalize_search_query(query: str) -> str:
+    """Case-fold, drop punctuation and filler words, and sort the remaining terms.
+
+    "Tesla industry comparison" and "industry comparison for TESLA?" both
+    become "comparison industry tesla".
+    """
+    words = {word.strip(".'-") for word in _WORD.findall((query or "").lower())}
+    return " ".join(sorted(words - _STOP_WORDS - {""}))
+
+
+## Backends
+class SerperBackend:
+    """Google results through crewai_tools' ``SerperDevTool`` (imported on first lookup)."""
+
+    name = "serper"
+
+    def __init__(self, n_results: int = SEARCH_RESULTS):
+        self.n_results = n_results
+        self._tool = None
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> dict:
+        with self._lock:
+            if self._tool is None:
+                from crewai_tools import SerperDevTool
+                self._tool = SerperDevTool(n_results=self.n_results)
+        return self._tool._run(search_query=query)
+
+
+class FixtureSearchBackend:
+    """Canned results for offline runs and tests.
+
+    ``path`` is a JSON object mapping queries to Serper-shaped results
+    (``{"organic": [{"title", "link", "snippet"}, ...]}``); keys are matched
+    after normalization and a ``"*"`` entry answers every other query.
+    Without a file or a match, three generic results are returned.
+    ``latency_s`` simulates the provider round trip.
+    """
+
+    name = "fixture"
+
+    def __init__(self, path: str = None, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.fixtures = {}
+        if path:
+            with open(path) as f:
+                self.fixtures = {
+                    key if key == "*" else normalize_search_query(key): value for key, value in json.load(f).items()
+                }
+
+    def search(self, query: str) -> dict:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        results = self.fixtures.get(normalize_search_query(query)) or self.fixtures.get("*")
+        if results is None:
+            results = {"organic": [
+                {
+                    "title": f"Fixture result {n} for {query}",
+                    "link": f"https://example.com/{n}",
+                    "snippet": "Canned search result from the fixture search backend.",
+                    "position": n,
+                }
+                for n in range(1, 4)
+            ]}
+        return {"searchParameters": {"q": query, "type": "search"}, **results}
+
+
+# Built on first lookup; assign search.search_backend to substitute another backend
+search_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Return the configured search backend, creating it on first use."""
+    global search_backend
+    with _backend_lock:
+        if search_backend is None:
+            if SEARCH_BACKEND == "fixture":
+                search_backend = FixtureSearchBackend(SEARCH_FIXTURES or None)
+            elif SEARCH_BACKEND == "serper":
+                search_backend = SerperBackend()
+            else:
+                raise ValueError(f"Unknown SEARCH_BACKEND {SEARCH_BACKEND!r}; use serper or fixture")
+        return search_backend
+
+
+## Per-run budget
+class SearchBudget:
+    """Backend lookups left for one crew run."""
+
+    def __init__(self, max_calls: int):
+        self.max_calls = max_calls
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.max_calls and self.calls >= self.max_calls:
+                return False
+            self.calls += 1
+            return True
+
+
+# Shared by the threads of one run: parallel crew stages copy the context
+_current_budget = contextvars.ContextVar("search_budget", default=None)
+_capped = 0
+_capped_lock = threading.Lock()
+
+
+@contextmanager
+def search_budget(max_calls: int = SEARCH_MAX_CALLS_PER_RUN):
+    """Cap backend lookups made in this context (one crew run) at ``max_calls``."""
+    budget = SearchBudget(max_calls)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+## Lookups
+def format_results(results: dict, limit: int = SEARCH_RESULTS) -> str:
+    """Compact text of a Serper-shaped result: knowledge graph entry and top organic hits."""
+    lines = []
+    graph = results.get("knowledgeGraph")
+    if graph and graph.get("title"):
+        lines.append(f"{graph['title']}: {graph.get('description', '')}".strip())
+    for n, item in enumerate(results.get("organic", [])[:limit], 1):
+        lines.append(f"{n}. {item.get('title', '')}\n   {item.get('snippet', '')}\n   {item.get('link', '')}")
+    return "\n".join(lines) or "No results found."
+
+
+def _lookup(backend, key: str, query: str) -> dict:
+    with span("search", backend.name):
+        results = backend.search(query)
+    search_cache.set(key, results)
+    return results
+
+
+def cached_search(query: str) -> str:
+    """Search results for ``query`` as text, served from the cache when possible."""
+    global _capped
+    normalized = normalize_search_query(query)
+    if not normalized:
+        return "Provide a search query with at least one specific term."
+    backend = get_search_backend()
+    key = f"{backend.name}:{normalized}"
+    results = search_cache.get(key)
+    if results is None:
+        budget = _current_budget.get()
+        if budget is not None and not budget.take():
+            with _capped_lock:
+                _capped += 1
+            return (
+                f"Search limit reached: this analysis already made {budget.max_calls} web searches. "
+                "Continue with the information you have."
+            )
+        results = search_calls.do(key, lambda: _lookup(backend, key, query))
+    return format_results(results)
+
+
+def search_stats() -> dict:
+    """Cache, coalescing and per-run cap counters for web searches."""
+    with _capped_lock:
+        capped = _capped
+    return {
+        "backend": SEARCH_BACKEND,
+        "max_calls_per_run": SEARCH_MAX_CALLS_PER_RUN,
+        "capped": capped,
+        "cache": search_cache.stats(),
+        "coalescing": search_calls.stats(),
+    }
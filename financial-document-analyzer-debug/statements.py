@@ -0,0 +1,308 @@
+## Importing libraries and files
+import os
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from cache import TieredCache, file_sha256
+from extraction import extract_pages
+
+## Table row parsing
+# A statement row is a label followed by two or more numeric columns, e.g.
+# "Total revenues 24,927 25,500", "Total revenues $ 22,496 $ 25,500" (PDF text
+# usually keeps a space after the currency sign) or
+# "Net cash used in investing (1,234) (987)". Every cell has exactly one way to
+# match (one sign, a space only directly after a "$"), so the whitespace between
+# columns cannot be split differently and a non-matching line fails fast.
+_AMOUNT = r"\d[\d,]*(?:\.\d+)?"
+# Change columns are often given in percent or basis points ("-12%", "-87 bp")
+NUMBER = rf"(?:-(?:\$ ?)?|\$ ?-?)?(?:\((?:\$ ?)?-?{_AMOUNT}\)|{_AMOUNT})(?:%| ?bps?)?|—|–"
+# Labels are capped so a long line that is not a row is rejected in linear time
+TABLE_ROW = re.compile(rf"^(?P<label>[A-Za-z][A-Za-z0-9 ,&'’()/\-.:]{{2,150}}?)\s+(?P<values>(?:{NUMBER})(?:\s+(?:{NUMBER}))+)\s*$")
+_VALUE = re.compile(NUMBER)
+_CHANGE_CELL = re.compile(r"(?:%|bps?)$")
+_PERIOD = re.compile(r"\b(?:(?:Q[1-4]|FY|H[12])[\s\-']*)?(?:19|20)\d{2}\b", re.IGNORECASE)
+_YEAR = re.compile(r"(?:19|20)\d{2}")
+# Column header labels such as "Three Months Ended June 30," or "Fiscal year"
+_HEADER_LABEL = re.compile(
+    r"\bended\b|\bmonths\b|\bweeks\b|\byears?\b|\bquarter|\bfiscal\b|\bas of\b|\bperiod\b|"
+    r"\b(?:january|february|march|april|may|june|july|august|september|october|november|december)\b",
+    re.IGNORECASE,
+)
+# Sub-headings that make the "Basic"/"Diluted" rows below them per-share
+# amounts, as opposed to the share counts listed under "Weighted average shares"
+_PER_SHARE_HEADING = re.compile(r"per (?:common )?share|\beps\b", re.IGNORECASE)
+_SHARE_COUNT_HEADING = re.compile(r"weighted[- ]average|shares (?:used|outstanding)|number of shares", re.IGNORECASE)
+
+# Page headings that identify each statement
+STATEMENT_HEADINGS = {
+    "income_statement": re.compile(r"income statements?|statements? of (?:consolidated )?(?:operations|income|earnings)|statements? of comprehensive income", re.IGNORECASE),
+    "balance_sheet": re.compile(r"balance sheets?|statements? of financial position", re.IGNORECASE),
+    "cash_flow": re.compile(r"statements? of cash flows?|cash flow statements?|cash flows? summary", re.IGNORECASE),
+}
+
+# Canonical metrics: (statement the row is expected in, label pattern)
+METRICS = {
+    "revenue": ("income_statement", re.compile(r"^(?:total )?(?:net )?revenues?$|^total net sales|^net sales", re.IGNORECASE)),
+    "gross_profit": ("income_statement", re.compile(r"^(?:total )?gross (?:profit|margin)$", re.IGNORECASE)),
+    "operating_income": ("income_statement", re.compile(r"^(?:income|loss|income \(loss\)) from operations|^operating (?:income|profit)", re.IGNORECASE)),
+    "net_income": ("income_statement", re.compile(r"^net (?:income|earnings)(?! per)(?!.*per share)", re.IGNORECASE)),
+    "eps_diluted": ("income_statement", re.compile(
+        r"^(?!.*(?:weighted|shares used|shares outstanding))(?=.*diluted)(?=.*(?:per (?:common )?share|\beps\b))",
+        re.IGNORECASE,
+    )),
+    "total_assets": ("balance_sheet", re.compile(r"^total assets", re.IGNORECASE)),
+    "total_liabilities": ("balance_sheet", re.compile(r"^total liabilities$", re.IGNORECASE)),
+    "cash_and_equivalents": ("balance_sheet", re.compile(r"^cash and cash equivalents|^cash, cash equivalents", re.IGNORECASE)),
+    "total_debt": ("balance_sheet", re.compile(r"^total debt|^long-term debt|debt and finance leases", re.IGNORECASE)),
+    "operating_cash_flow": ("cash_flow", re.compile(r"operating activities|^cash flows? from operations", re.IGNORECASE)),
+    "capital_expenditures": ("cash_flow", re.compile(r"^capital expenditures|purchases of property", re.IGNORECASE)),
+    "free_cash_flow": ("cash_flow", re.compile(r"^free cash flow", re.IGNORECASE)),
+}
+
+
+@dataclass
+class StatementTable:
+    """Rows of one financial statement; ``values`` has one row per label and one column per period."""
+    kind: str
+    periods: list
+    labels: list = field(default_factory=list)
+    values: np.ndarray = None
+    pages: list = field(default_factory=list)
+
+    def find(self, pattern):
+        """Return the first row matching ``pattern`` as a float array, or None."""
+        for i, label in enumerate(self.labels):
+            if pattern.search(label):
+                return self.values[i]
+        return None
+
+
+@dataclass
+class FinancialStatements:
+    tables: dict
+    metrics: dict
+    total_pages: int
+
+
+def parse_number(token: str) -> float:
+    """Parse a statement cell: commas and currency signs dropped, parentheses mean negative."""
+    if token in ("—", "–"):
+        return np.nan
+    token = re.sub(r"[\s$]|bps?$", "", token)
+    negative = (token.startswith("(") and token.endswith(")")) or token.startswith("-")
+    digits = token.strip("()%-").replace(",", "")
+    try:
+        value = float(digits)
+    except ValueError:
+        return np.nan
+    return -value if negative else value
+
+
+def is_period_header(line: str, tokens: list) -> bool:
+    """True for column header lines like "Three Months Ended June 30, 2025 2024".
+
+    Every number on the line is a year (or the day of a date) and the line
+    names a period or a month.
+    """
+    cells = [token.strip(" ,") for token in tokens]
+    years = [cell for cell in cells if _PERIOD.fullmatch(cell)]
+    days = [cell for cell in cells if cell.isdigit() and 1 <= int(cell) <= 31]
+    return len(years) >= 2 and len(years) + len(days) == len(cells) and _HEADER_LABEL.search(line) is not None
+
+
+def _split_row(line: str):
+    """``(label, [cell tokens])`` for a statement row, or None."""
+    match = TABLE_ROW.match(line.strip())
+    if match is None:
+        return None
+    tokens = _VALUE.findall(match.group("values"))
+    if is_period_header(line, tokens):
+        return None
+    return match.group("label").strip(" .:,"), tokens
+
+
+def parse_row(line: str):
+    """Return ``(label, [values])`` for a statement row, or None (also for column header lines)."""
+    split = _split_row(line)
+    if split is None:
+        return None
+    label, tokens = split
+    return label, [parse_number(token) for token in tokens]
+
+
+def _fit_columns(tokens: list, width: int) -> list:
+    """Values of a row's ``width`` period columns.
+
+    Extra cells are change columns ("-12%", "-87 bp" after the periods) or
+    note references before them: percent and basis-point cells are dropped
+    first, then leading cells.
+    """
+    if len(tokens) > width:
+        levels = [token for token in tokens if not _CHANGE_CELL.search(token)]
+        if len(levels) >= width:
+            tokens = levels
+        else:
+            # Rows of ratios ("Gross margin 18.0% ... 17.2% -87 bp") keep their
+            # percentages; only a trailing basis-point change is dropped
+            while len(tokens) > width and re.search(r"bps?$", tokens[-1]):
+                tokens = tokens[:-1]
+    values = [parse_number(token) for token in tokens]
+    # Keep the trailing period columns; leading numbers are usually note references
+    return values[-width:] if len(values) >= width else [np.nan] * (width - len(values)) + values
+
+
+def _page_periods(lines) -> list:
+    """Column headers of a page: the first line naming two or more periods."""
+    for line in lines:
+        periods = _PERIOD.findall(line)
+        if len(periods) >= 2:
+            return [re.sub(r"\s+", " ", period.strip()) for period in periods]
+    return []
+
+
+def _is_per_share_heading(line: str) -> bool:
+    line = line.strip()
+    # Unit notes such as "(in millions, except per share data)" are not headings
+    if line.startswith("(") or "except per share" in line.lower():
+        return False
+    return _PER_SHARE_HEADING.search(line) is not None and _SHARE_COUNT_HEADING.search(line) is None
+
+
+def parse_statements(pages) -> dict:
+    """Collect statement rows from ``(page_index, text)`` pages into ``StatementTable``s."""
+    rows = {kind: {"labels": [], "values": [], "pages": [], "periods": []} for kind in STATEMENT_HEADINGS}
+    for page_index, content in pages:
+        kinds = [kind for kind, heading in STATEMENT_HEADINGS.items() if heading.search(content)]
+        if not kinds:
+            continue
+        lines = content.split("\n")
+        periods = _page_periods(lines)
+        # Rows belong to the statement whose heading appears last above them
+        current = kinds[0]
+        per_share = False
+        for line in lines:
+            for kind, heading in STATEMENT_HEADINGS.items():
+                if heading.search(line):
+                    current = kind
+            parsed = _split_row(line)
+            if parsed is None:
+                if line.strip():
+                    # Any other line ends a run of per-share rows or starts one
+                    per_share = _is_per_share_heading(line)
+                continue
+            label, tokens = parsed
+            if per_share and not _PER_SHARE_HEADING.search(label):
+                label = f"{label} per share"
+            table = rows[current]
+            if not table["periods"] and periods:
+                table["periods"] = periods
+            values = _fit_columns(tokens, len(table["periods"]) or len(tokens))
+            table["labels"].append(label)
+            table["values"].append(values)
+            if page_index not in table["pages"]:
+                table["pages"].append(page_index)
+
+    tables = {}
+    for kind, table in rows.items():
+        if not table["labels"]:
+            continue
+        width = max(len(values) for values in table["values"])
+        matrix = np.full((len(table["values"]), width), np.nan, dtype=np.float64)
+        for i, values in enumerate(table["values"]):
+            matrix[i, width - len(values):] = values
+        periods = table["periods"][-width:] if len(table["periods"]) >= width else [f"col{i + 1}" for i in range(width)]
+        tables[kind] = StatementTable(kind, periods, table["labels"], matrix, table["pages"])
+    return tables
+
+
+def _latest_and_prior(periods: list):
+    """Indices of the most recent column and the column a year before it."""
+    years = []
+    for period in periods:
+        match = _YEAR.search(period)
+        years.append(int(match.group(0)) if match else None)
+    if len(periods) < 2:
+        return 0, None
+    if all(year is not None for year in years):
+        # Periods run oldest-to-newest (quarterly updates) or newest-first (10-K/10-Q)
+        latest = len(years) - 1 if years[-1] >= years[0] else 0
+        prefix = _YEAR.sub("", periods[latest]).strip()
+        for i, (period, year) in enumerate(zip(periods, years)):
+            if year == years[latest] - 1 and _YEAR.sub("", period).strip() == prefix:
+                return latest, i
+        return latest, (latest - 1 if latest > 0 else latest + 1)
+    # Without year headers assume the most recent period comes first
+    return 0, 1
+
+
+def compute_metrics(tables: dict) -> dict:
+    """Latest value and year-over-year change for each canonical metric found."""
+    metrics = {}
+    for name, (kind, pattern) in METRICS.items():
+        candidates = [tables[kind]] if kind in tables else []
+        candidates += [table for other, table in tables.items() if other != kind]
+        for table in candidates:
+            row = table.find(pattern)
+            if row is None or np.all(np.isnan(row)):
+                continue
+            latest, prior = _latest_and_prior(table.periods)
+            current = row[latest]
+            previous = row[prior] if prior is not None else np.nan
+            change = current - previous
+            metrics[name] = {
+                "period": table.periods[latest],
+                "value": float(current),
+                "prior_period": table.periods[prior] if prior is not None else None,
+                "prior_value": None if np.isnan(previous) else float(previous),
+                "change": None if np.isnan(change) else float(change),
+                "change_pct": None if np.isnan(change) or previous == 0 else float(change / abs(previous) * 100),
+            }
+            break
+    return metrics
+
+
+statements_cache = TieredCache(
+    name="statements",
+    max_entries=int(os.environ.get("STATEMENTS_CACHE_SIZE", "32")),
+)
+
+
+def extract_statements(file_path: str) -> FinancialStatements:
+    """Parse and cache the financial statements of a document (keyed by file hash)."""
+    key = file_sha256(file_path)
+    cached = statements_cache.get(key)
+    if cached is not None:
+        return cached
+
+    extraction = extract_pages(file_path, max_pages=0, focus_sections=False)
+    tables = parse_statements(extraction["pages"])
+    result = FinancialStatements(tables, compute_metrics(tables), extraction["total_pages"])
+    statements_cache.set(key, result)
+    return result
+
+
+def _fmt(value: float) -> str:
+    if value is None or np.isnan(value):
+        return "n/a"
+    return f"{value:,.2f}" if abs(value) < 100 else f"{value:,.0f}"
+
+
+def summarize(statements: FinancialStatements) -> str:
+    """Compact text summary of key metrics and year-over-year deltas for the agents."""
+    if not statements.metrics:
+        return ""
+    lines = ["KEY FINANCIAL METRICS (parsed from statement tables; figures as reported, usually in millions except per-share data)"]
+    for name, metric in statements.metrics.items():
+        line = f"- {name.replace('_', ' ').title()}: {_fmt(metric['value'])} ({metric['period']})"
+        if metric["prior_value"] is not None:
+            line += f" vs {_fmt(metric['prior_value'])} ({metric['prior_period']})"
+        if metric["change_pct"] is not None:
+            line += f", {metric['change_pct']:+.1f}%"
+        lines.append(line)
+    lines.append("")
+    for kind, table in statements.tables.items():
+        pages = ", ".join(str(page + 1) for page in table.pages[:10])
+        lines.append(f"{kind.replace('_', ' ').title()}: {len(table.labels)} rows, periods {', '.join(table.periods)} (pages {pages})")
+    return "\n".join(lines)
@@ -1,23 +1,34 @@
 ## Importing libraries and files
 from crewai import Task
 
-from agents import financial_analyst, verifier, investment_advisor, risk_assessor
-from tools import read_data_tool, search_tool
+from tools import get_search_tool, read_data_tool, read_financial_statements_tool
 
-## Creating a task to help solve user's query
-analyze_financial_document_task = Task(
-    description="Thoroughly analyze the financial document to address the user's query: {query}.\n\
+
+def create_tasks(agents, parallel: bool = False):
+    """Build the four analysis tasks bound to ``agents`` (see ``agents.create_agents``).
+
+    Tasks carry their outputs and interpolated inputs, so every pooled crew
+    gets its own copies. With ``parallel=True`` the three analysis tasks take
+    only the verification report as context, so they can run side by side once
+    verification is done. Returns a dict keyed by task name.
+    """
+    search_tool = get_search_tool()
+
+    ## Creating a task to help solve user's query
+    analyze_financial_document_task = Task(
+        description="Thoroughly analyze the financial document to address the user's query: {query}.\n\
 \n\
 CRITICAL: The financial document file path is: {file_path}\n\
 You MUST use the Read Financial Document tool and pass the file_path parameter as: {file_path}\n\
-Call the tool like this: read_data_tool(file_path='{file_path}')\n\
+Call the tool like this: read_data_tool(file_path='{file_path}', query='{query}')\n\
 \n\
+Start with the Read Financial Statements tool (file_path='{file_path}') for the key metrics and year-over-year changes.\n\
 After reading the document, extract key financial metrics including revenue, net income, EPS, margins, cash flow, and debt levels.\n\
 Identify significant trends, year-over-year changes, and notable items in the financial data.\n\
 Search the internet for relevant market context and industry comparisons if needed.\n\
 Provide a comprehensive, data-driven analysis with specific numbers cited from the document.",
 
-    expected_output="""A comprehensive financial analysis report including:
+        expected_output="""A comprehensive financial analysis report including:
 1. Executive Summary - Key findings and highlights from the document
 2. Financial Performance Overview - Revenue, profitability, margins, and growth metrics with specific numbers
 3. Balance Sheet Analysis - Assets, liabilities, equity position, and liquidity ratios
@@ -26,23 +37,32 @@ Provide a comprehensive, data-driven analysis with specific numbers cited from t
 6. Market Context - How the company compares to industry benchmarks
 7. Sources - References to specific data points from the financial document""",
 
-    agent=financial_analyst,
-    tools=[read_data_tool, search_tool],
-    async_execution=False,
-)
+        agent=agents["financial_analyst"],
+        tools=[read_financial_statements_tool, read_data_tool, search_tool],
+        async_execution=False,
+    )
 
-## Creating an investment analysis task
-investment_analysis = Task(
-    description="Based on the financial analysis, provide well-reasoned investment recommendations.\n\
-Review the key financial metrics and trends identified in the previous analysis.\n\
+    ## Creating an investment analysis task
+    if parallel:
+        # Runs alongside the financial analysis, so there is no analysis to build on:
+        # the advisor works from the statements and the document itself
+        investment_basis = "Provide well-reasoned investment recommendations for the financial document.\n\
+The financial analysis runs at the same time as this task and is not available to you; only the verification report is. \
+Establish the key financial metrics and trends yourself with the tools below.\n"
+    else:
+        investment_basis = "Based on the financial analysis, provide well-reasoned investment recommendations.\n\
+Review the key financial metrics and trends identified in the previous analysis.\n"
+    investment_analysis = Task(
+        description=investment_basis + "\
+Use the Read Financial Statements tool with file path: {file_path} for the key metrics and year-over-year changes.\n\
 User query: {query}\n\
 The financial document is located at: {file_path}\n\
-If you need to reference the original document, use the Read Financial Document tool with file path: {file_path}.\n\
+If you need to reference the original document, use the Read Financial Document tool with file path: {file_path} and query: {query}.\n\
 Evaluate the company's valuation, growth prospects, and competitive position.\n\
 Consider different investor profiles (conservative, moderate, aggressive) in your recommendations.\n\
 Ensure all recommendations are grounded in actual financial data from the document.",
 
-    expected_output="""A structured investment analysis report including:
+        expected_output="""A structured investment analysis report including:
 1. Investment Thesis - Clear bull and bear cases supported by financial data
 2. Valuation Assessment - Key valuation metrics (P/E, P/B, EV/EBITDA) with context
 3. Growth Analysis - Revenue and earnings growth trajectory and sustainability
@@ -50,23 +70,24 @@ Ensure all recommendations are grounded in actual financial data from the docume
 5. Key Catalysts and Risks - Upcoming events or factors that could impact the investment
 6. Disclaimer - Standard investment disclaimer about risks and the importance of personal research""",
 
-    agent=investment_advisor,
-    tools=[read_data_tool, search_tool],
-    async_execution=False,
-)
+        agent=agents["investment_advisor"],
+        tools=[read_financial_statements_tool, read_data_tool, search_tool],
+        async_execution=False,
+    )
 
-## Creating a risk assessment task
-risk_assessment = Task(
-    description="Conduct a comprehensive risk assessment based on the financial document.\n\
+    ## Creating a risk assessment task
+    risk_assessment = Task(
+        description="Conduct a comprehensive risk assessment based on the financial document.\n\
 Analyze all risk factors present in the financial data and disclosures.\n\
 User query: {query}\n\
 The financial document is located at: {file_path}\n\
-Read the document using the Read Financial Document tool with file path: {file_path} to analyze risk factors.\n\
+Read the document using the Read Financial Document tool with file path: {file_path} and query: 'risk factors, debt, liquidity' to analyze risk factors.\n\
+Use the Read Financial Statements tool with file path: {file_path} for leverage, liquidity and cash flow figures.\n\
 Evaluate credit risk, market risk, liquidity risk, and operational risk.\n\
 Identify potential red flags and vulnerabilities in the financial statements.\n\
 Provide actionable risk mitigation strategies based on the actual data.",
 
-    expected_output="""A detailed risk assessment report including:
+        expected_output="""A detailed risk assessment report including:
 1. Risk Summary - Overall risk profile rating and key risk factors identified
 2. Financial Risk Analysis - Leverage, liquidity, and solvency risks with specific ratios
 3. Market Risk Factors - Industry, competitive, and macroeconomic risks
@@ -74,23 +95,24 @@ Provide actionable risk mitigation strategies based on the actual data.",
 5. Risk Mitigation Strategies - Practical recommendations to manage identified risks
 6. Risk Matrix - Summary of risks categorized by likelihood and potential impact""",
 
-    agent=risk_assessor,
-    tools=[read_data_tool],
-    async_execution=False,
-)
+        agent=agents["risk_assessor"],
+        tools=[read_financial_statements_tool, read_data_tool],
+        async_execution=False,
+    )
+
 
-    
-verification = Task(
-    description="Verify that the provided document is a valid financial document.\n\
+    verification = Task(
+        description="Verify that the provided document is a valid financial document.\n\
 \n\
 CRITICAL: The document file path is: {file_path}\n\
-You MUST use the Read Financial Document tool and pass the file_path parameter: read_data_tool(file_path='{file_path}')\n\
+You MUST use the Read Financial Document tool and pass the file_path parameter: \
+read_data_tool(file_path='{file_path}', query='document type, company name, reporting period, financial statements')\n\
 \n\
 After reading, check for key financial document characteristics such as financial statements, disclosures, and reporting elements.\n\
 Extract metadata: company name, reporting period, document type, and filing information.\n\
 Confirm the document's data integrity and suitability for financial analysis.",
 
-    expected_output="""A verification report including:
+        expected_output="""A verification report including:
 1. Document Validity - Confirmed as valid financial document (Yes/No) with reasoning
 2. Document Type - Type of financial report (10-K, 10-Q, Annual Report, Earnings Update, etc.)
 3. Company Information - Company name, ticker symbol, and reporting period
@@ -98,7 +120,54 @@ Confirm the document's data integrity and suitability for financial analysis.",
 5. Data Quality - Assessment of data completeness and consistency
 6. Recommendation - Whether the document is suitable for detailed financial analysis""",
 
-    agent=verifier,
-    tools=[read_data_tool],
-    async_execution=False
-)
+        agent=agents["verifier"],
+        tools=[read_data_tool],
+        async_execution=False
+    )
+
+    if parallel:
+        for task in (analyze_financial_document_task, investment_analysis, risk_assessment):
+            task.context = [verification]
+
+    return {
+        "verification": verification,
+        "analyze_financial_document_task": analyze_financial_document_task,
+        "investment_analysis": investment_analysis,
+        "risk_assessment": risk_assessment,
+    }
+
+
+def create_update_tasks(agents):
+    """Build one task per report section that revises the section for an updated filing.
+
+    Used by incremental mode: each task gets its previous section
+    ({previous_report}) and the changed pages that concern it
+    ({changed_pages}), and keeps the structure of the full task's expected
+    output. Returns a dict keyed by the same task names as ``create_tasks``.
+    """
+    update_tasks = {}
+    for name, full_task in create_tasks(agents, parallel=True).items():
+        update_tasks[name] = Task(
+            description="The financial document at {file_path} is a revised version of a filing you already analyzed.\n\
+User query: {query}\n\
+\n\
+Your previous report for this section:\n\
+---\n\
+{previous_report}\n\
+---\n\
+\n\
+Pages that were added or changed in the revised version and concern this section:\n\
+---\n\
+{changed_pages}\n\
+---\n\
+\n\
+Update your previous report so it reflects the revised document. Keep every part that the changed pages do not affect, \
+and revise the figures, findings and conclusions that they do affect. Say briefly what changed versus the previous version.\n\
+Only if the changed pages above are cut short, use the Read Financial Document tool with file path: {file_path} \
+and query: {query} for the rest.",
+            expected_output=full_task.expected_output,
+            agent=full_task.agent,
+            tools=full_task.tools,
+            async_execution=False,
+        )
+    return update_tasks
@@ -0,0 +1,41 @@
+"""Shared test setup: import the app modules from the project directory and
+keep every on-disk cache out of the working tree."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+# Module-level caches and stores read these at import time
+_STATE_DIR = tempfile.mkdtemp(prefix="fda-tests-")
+for _name, _value in {
+    "SEARCH_BACKEND": "fixture",
+    "SEARCH_CACHE_DB": "",
+    "ANALYSIS_CACHE_DB": "",
+    "EXTRACTION_CACHE_DB": "",
+    "RATE_LIMIT_DB": os.path.join(_STATE_DIR, "rate_limit.sqlite3"),
+    "REVISIONS_DB": os.path.join(_STATE_DIR, "revisions.sqlite3"),
+    "JOBS_DB": os.path.join(_STATE_DIR, "jobs.sqlite3"),
+}.items():
+    os.environ.setdefault(_name, _value)
+
+
+class FakeClock:
+    """Stands in for the ``time`` module in cache.py so TTL tests need no sleeps."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import cache
+    fake = FakeClock()
+    monkeypatch.setattr(cache, "time", fake)
+    return fake
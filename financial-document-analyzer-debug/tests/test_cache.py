@@ -0,0 +1,124 @@
+import pickle
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from cache import SingleFlight, TieredCache
+
+
+def test_lru_evicts_least_recently_used():
+    lru = TieredCache("test", max_entries=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # "b" is now the least recently used
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    stats = lru.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_ttl_expires_memory_entries(clock):
+    ttl = TieredCache("test", ttl_seconds=60)
+    ttl.set("key", "value")
+    clock.now += 59
+    assert ttl.get("key") == "value"
+    clock.now += 2
+    assert ttl.get("key", "miss") == "miss"
+    assert ttl.stats()["expirations"] == 1
+    assert ttl.stats()["entries"] == 0
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    TieredCache("test", db_path=db_path).set("key", {"rows": [1, 2]})
+    reopened = TieredCache("test", db_path=db_path)
+    assert reopened.get("key") == {"rows": [1, 2]}
+    assert reopened.stats()["disk_hits"] == 1
+    # Caches sharing a database are kept apart by name
+    assert TieredCache("other", db_path=db_path).get("key") is None
+
+
+def test_disk_tier_is_bounded(tmp_path, clock):
+    db_path = str(tmp_path / "cache.sqlite3")
+    disk = TieredCache("test", max_entries=1, db_path=db_path, max_disk_entries=2)
+    for n, key in enumerate("abc"):
+        clock.now += 1
+        disk.set(key, n)
+    with sqlite3.connect(db_path) as conn:
+        keys = {row[0] for row in conn.execute("SELECT key FROM cache_entries")}
+    assert keys == {"b", "c"}
+
+
+def test_disk_tier_respects_ttl(tmp_path, clock):
+    db_path = str(tmp_path / "cache.sqlite3")
+    TieredCache("test", db_path=db_path, ttl_seconds=60).set("key", "value")
+    clock.now += 61
+    reopened = TieredCache("test", db_path=db_path, ttl_seconds=60)
+    assert reopened.get("key") is None
+    assert reopened.stats()["expirations"] == 1
+
+
+def test_legacy_database_rows_count_as_expired(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE cache_entries (cache TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+            " accessed_at REAL NOT NULL, PRIMARY KEY (cache, key))"
+        )
+        conn.execute(
+            "INSERT INTO cache_entries VALUES (?, ?, ?, ?)", ("test", "key", pickle.dumps("old"), time.time())
+        )
+    assert TieredCache("test", db_path=db_path, ttl_seconds=60).get("key") is None
+    # Without a TTL the migrated row is still served
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "INSERT INTO cache_entries (cache, key, value, accessed_at) VALUES (?, ?, ?, ?)",
+            ("test", "key", pickle.dumps("old"), time.time()),
+        )
+    assert TieredCache("test", db_path=db_path).get("key") == "old"
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", slow)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", slow))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"name": "test", "in_flight": 0, "executed": 1, "coalesced": 4}
+
+
+def test_single_flight_forgets_failed_calls():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise RuntimeError("backend down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    # The failed call is not remembered: the next call runs again
+    assert flight.do("key", lambda: "ok") == "ok"
+    assert flight.stats()["executed"] == 2
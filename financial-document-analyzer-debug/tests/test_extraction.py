@@ -0,0 +1,45 @@
+import pytest
+
+import extraction
+from cache import TieredCache
+from extraction import extract_pages, select_pages
+
+FINANCIAL_PAGE = "Consolidated balance sheet: total assets, liabilities and equity"
+
+
+def full_extraction(total_pages: int) -> dict:
+    pages = [(i, FINANCIAL_PAGE if i % 10 == 5 else f"Narrative page {i}") for i in range(total_pages)]
+    return {"total_pages": total_pages, "pages": pages}
+
+
+@pytest.fixture
+def parses(monkeypatch, tmp_path):
+    """Count real parses of a 40-page document behind a fresh extraction cache."""
+    calls = []
+
+    def fake_extract_all(file_path):
+        calls.append(file_path)
+        return full_extraction(40)
+
+    monkeypatch.setattr(extraction, "extraction_cache", TieredCache("extraction"))
+    monkeypatch.setattr(extraction, "_extract_all", fake_extract_all)
+    pdf = tmp_path / "filing.pdf"
+    pdf.write_bytes(b"%PDF-1.4 test")
+    return str(pdf), calls
+
+
+def test_every_selection_shares_one_parse(parses):
+    path, calls = parses
+    gate = extract_pages(path, max_pages=50, focus_sections=True)
+    everything = extract_pages(path, max_pages=0, focus_sections=False)
+    top = extract_pages(path, max_pages=4, focus_sections=True)
+    assert len(calls) == 1
+    assert len(gate["pages"]) == len(everything["pages"]) == 40
+    assert [i for i, _ in top["pages"]] == [5, 15, 25, 35]
+
+
+def test_select_pages_limits_small_documents_by_page_index():
+    selected = select_pages(full_extraction(20), max_pages=3, focus_sections=True)
+    assert [i for i, _ in selected["pages"]] == [0, 1, 2]
+    assert selected["total_pages"] == 20
+    assert len(select_pages(full_extraction(20), max_pages=0, focus_sections=False)["pages"]) == 20
@@ -0,0 +1,132 @@
+import json
+import threading
+
+import pytest
+
+import search
+from cache import SingleFlight, TieredCache
+from search import FixtureSearchBackend, cached_search, normalize_search_query, search_budget
+
+
+class CountingBackend(FixtureSearchBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> dict:
+        with self._lock:
+            self.queries.append(query)
+        return super().search(query)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """A fresh counting fixture backend, result cache and coalescer for each test."""
+    counting = CountingBackend()
+    monkeypatch.setattr(search, "search_backend", counting)
+    monkeypatch.setattr(search, "search_cache", TieredCache("search", ttl_seconds=search.SEARCH_CACHE_TTL))
+    monkeypatch.setattr(search, "search_calls", SingleFlight("search_calls"))
+    return counting
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Tesla industry comparison", "industry comparison for TESLA?"),
+    ("Tesla Q2 2025 deliveries", "q2 2025 deliveries, tesla?"),
+    ("What is the EV market outlook", "EV market outlook"),
+])
+def test_normalize_search_query_ignores_phrasing(first, second):
+    assert normalize_search_query(first) == normalize_search_query(second)
+
+
+def test_normalize_search_query_keeps_topic_words():
+    assert normalize_search_query("Tesla market context and industry comparison") == (
+        "comparison context industry market tesla"
+    )
+    keys = {normalize_search_query(query) for query in ("Tesla", "Tesla market context", "Tesla industry comparison")}
+    assert len(keys) == 3
+    assert normalize_search_query("Tesla 2024") != normalize_search_query("Tesla 2025")
+    assert normalize_search_query("the and of") == ""
+
+
+def test_fixture_backend_matches_normalized_keys(tmp_path):
+    fixtures = tmp_path / "search.json"
+    fixtures.write_text(json.dumps({
+        "Tesla deliveries 2025": {"organic": [{"title": "Deliveries", "link": "https://example.com/d", "snippet": "384K"}]},
+        "*": {"organic": [{"title": "Default", "link": "https://example.com", "snippet": "n/a"}]},
+    }))
+    fixture = FixtureSearchBackend(str(fixtures))
+    assert fixture.search("2025 deliveries for TESLA")["organic"][0]["title"] == "Deliveries"
+    assert fixture.search("anything else")["organic"][0]["title"] == "Default"
+    assert len(FixtureSearchBackend().search("tesla")["organic"]) == 3
+
+
+def test_rephrased_queries_share_one_lookup(backend):
+    first = cached_search("Tesla market context and industry comparison")
+    second = cached_search("industry comparison and market context for TESLA")
+    assert first == second
+    assert len(backend.queries) == 1
+    assert search.search_cache.stats()["hits"] == 1
+
+
+def test_different_topics_are_looked_up_separately(backend):
+    for query in ("Tesla", "Tesla market context", "Tesla industry comparison"):
+        cached_search(query)
+    assert len(backend.queries) == 3
+
+
+def test_empty_query_makes_no_lookup(backend):
+    assert "specific term" in cached_search("the and of")
+    assert backend.queries == []
+
+
+def test_results_expire_after_ttl(backend, clock):
+    cached_search("tesla deliveries")
+    clock.now += search.SEARCH_CACHE_TTL - 1
+    cached_search("tesla deliveries")
+    assert len(backend.queries) == 1
+    clock.now += 2
+    cached_search("tesla deliveries")
+    assert len(backend.queries) == 2
+
+
+def test_per_run_cap_limits_backend_lookups(backend):
+    with search_budget(max_calls=2) as budget:
+        cached_search("tesla deliveries")
+        cached_search("tesla margins")
+        capped = cached_search("tesla energy storage")
+        # Cached results stay free once the cap is reached
+        repeated = cached_search("deliveries tesla")
+    assert "Search limit reached" in capped
+    assert "Search limit reached" not in repeated
+    assert budget.calls == 2
+    assert len(backend.queries) == 2
+    # The cap is per run: a new run gets a fresh budget
+    with search_budget(max_calls=2):
+        assert "Search limit reached" not in cached_search("tesla energy storage")
+
+
+def test_lookups_outside_a_run_are_not_capped(backend):
+    for n in range(search.SEARCH_MAX_CALLS_PER_RUN + 2):
+        assert "Search limit reached" not in cached_search(f"tesla topic{n}")
+
+
+def test_concurrent_identical_lookups_are_coalesced(backend):
+    backend.latency_s = 0.2
+    barrier = threading.Barrier(5)
+    results = []
+
+    def lookup():
+        barrier.wait()
+        results.append(cached_search("Tesla quarterly deliveries"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 5 and len(set(results)) == 1
+    assert len(backend.queries) == 1
+    assert search.search_calls.stats()["executed"] == 1
+    assert search.search_calls.stats()["coalesced"] == 4
@@ -0,0 +1,153 @@
+import math
+import re
+import time
+
+import pytest
+
+from statements import compute_metrics, parse_number, parse_row, parse_statements
+
+# An income statement page as pypdf extracts it from a typical 10-Q
+INCOME_STATEMENT_PAGE = """Consolidated Statements of Operations
+(in millions, except per share data)
+(unaudited)
+Three Months Ended June 30, 2025 2024
+Revenues
+Total revenues $ 22,496 $ 25,500
+Cost of revenues 18,618 20,922
+Gross profit 3,878 4,578
+Income from operations 923 1,605
+Net income attributable to common stockholders $ 1,172 $ 1,400
+Net income per share of common stock attributable to common stockholders
+Basic $ 0.36 $ 0.44
+Diluted $ 0.33 $ 0.42
+Weighted average shares used in computing net income per share of common stock
+Basic 3,220 3,191
+Diluted 3,520 3,481
+"""
+
+CASH_FLOW_PAGE = """Consolidated Statements of Cash Flows
+Six Months Ended June 30, 2025 2024
+Net cash provided by operating activities 4,700 3,612
+Capital expenditures (4,088) (5,441)
+Net cash used in investing activities $ (4,962) $ (6,381)
+"""
+
+# Quarterly update layout (the repo's TSLA sample): five quarters, then a YoY change column
+QUARTERLY_UPDATE_PAGE = """Income Statement (Unaudited)
+($ in millions, except percentages and per share data) Q2-2024 Q3-2024 Q4-2024 Q1-2025 Q2-2025 YoY
+Total revenues 25,500 25,182 25,707 19,335 22,496 -12%
+Total GAAP gross margin 18.0% 19.8% 16.3% 16.3% 17.2% -87 bp
+Income from operations 1,605 2,717 1,583 399 923 -42%
+Net income attributable to common stockholders (GAAP) 1,400 2,167 2,356 409 1,172 -16%
+"""
+
+QUARTERLY_CASH_FLOW_PAGE = """Cash Flows Summary
+($ in millions) Q2-2024 Q3-2024 Q4-2024 Q1-2025 Q2-2025 YoY
+Net cash provided by operating activities 3,612 6,255 4,814 2,156 2,540 -30%
+Capital expenditures (2,272) (3,513) (2,780) (1,492) (2,394) 5%
+Free cash flow 1,340 2,742 2,034 664 146 -89%
+"""
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Total revenues 24,927 25,500", ("Total revenues", [24927.0, 25500.0])),
+    ("Total revenues $ 22,496 $ 25,500", ("Total revenues", [22496.0, 25500.0])),
+    ("Total revenues $22,496 $25,500", ("Total revenues", [22496.0, 25500.0])),
+    ("Net cash used in investing (1,234) (987)", ("Net cash used in investing", [-1234.0, -987.0])),
+    ("Net cash used in investing $ (1,234) $ (987)", ("Net cash used in investing", [-1234.0, -987.0])),
+    ("Diluted EPS 0.33 0.42", ("Diluted EPS", [0.33, 0.42])),
+    ("Gross margin 17.2% 18.0%", ("Gross margin", [17.2, 18.0])),
+    ("Total GAAP gross margin 17.2% -87 bp", ("Total GAAP gross margin", [17.2, -87.0])),
+])
+def test_parse_row_real_world_shapes(line, expected):
+    assert parse_row(line) == expected
+
+
+def test_parse_row_dash_is_missing_value():
+    label, values = parse_row("Restructuring charges — 102")
+    assert label == "Restructuring charges"
+    assert math.isnan(values[0]) and values[1] == 102.0
+
+
+@pytest.mark.parametrize("line", [
+    "Three Months Ended June 30, 2025 2024",
+    "Six months ended 2025 2024",
+    "Fiscal Year 2024 2023",
+    "Revenues",
+    "(in millions, except per share data)",
+])
+def test_parse_row_skips_headers(line):
+    assert parse_row(line) is None
+
+
+@pytest.mark.parametrize("cell", ["(1,234)", "1,234", "-12%", "$ (1,234)"])
+def test_long_non_row_line_fails_fast(cell):
+    # Wide tables and crafted PDFs produce long lines of numbers that end in text
+    line = "Net cash used " + "  ".join([cell] * 200) + "  see note 4 below"
+    started = time.perf_counter()
+    assert parse_row(line) is None
+    assert time.perf_counter() - started < 0.5
+    row = parse_row("Net cash used " + "  ".join([cell] * 200))
+    assert row is not None and len(row[1]) == 200
+
+
+def test_parse_number():
+    assert parse_number("$ (1,234)") == -1234.0
+    assert parse_number("-5.5") == -5.5
+    assert parse_number("12%") == 12.0
+    assert math.isnan(parse_number("—"))
+
+
+def test_period_header_sets_columns_not_rows():
+    tables = parse_statements([(0, INCOME_STATEMENT_PAGE)])
+    income = tables["income_statement"]
+    assert income.periods == ["2025", "2024"]
+    assert not any(label.lower().startswith("three months") for label in income.labels)
+
+
+def test_eps_comes_from_per_share_rows_not_share_counts():
+    metrics = compute_metrics(parse_statements([(0, INCOME_STATEMENT_PAGE)]))
+    assert metrics["eps_diluted"]["value"] == 0.33
+    assert metrics["eps_diluted"]["prior_value"] == 0.42
+
+
+def test_share_count_row_alone_is_not_eps():
+    page = "Consolidated Statements of Operations\nFiscal Year 2025 2024\nDiluted 3,520 3,481\n"
+    assert "eps_diluted" not in compute_metrics(parse_statements([(0, page)]))
+
+
+def test_key_metrics_with_currency_signs():
+    metrics = compute_metrics(parse_statements([(0, INCOME_STATEMENT_PAGE), (1, CASH_FLOW_PAGE)]))
+    assert metrics["revenue"]["value"] == 22496.0
+    assert metrics["revenue"]["prior_value"] == 25500.0
+    assert metrics["net_income"]["value"] == 1172.0
+    assert metrics["operating_cash_flow"]["value"] == 4700.0
+    assert metrics["capital_expenditures"]["value"] == -4088.0
+
+
+def test_trailing_change_column_is_not_a_period():
+    tables = parse_statements([(0, QUARTERLY_UPDATE_PAGE), (1, QUARTERLY_CASH_FLOW_PAGE)])
+    income = tables["income_statement"]
+    assert income.periods == ["Q2-2024", "Q3-2024", "Q4-2024", "Q1-2025", "Q2-2025"]
+    assert income.find(re.compile("^total revenues", re.IGNORECASE)).tolist() == [25500.0, 25182.0, 25707.0, 19335.0, 22496.0]
+    assert income.find(re.compile("gross margin", re.IGNORECASE)).tolist() == [18.0, 19.8, 16.3, 16.3, 17.2]
+
+    metrics = compute_metrics(tables)
+    assert metrics["revenue"] == {
+        "period": "Q2-2025",
+        "value": 22496.0,
+        "prior_period": "Q2-2024",
+        "prior_value": 25500.0,
+        "change": -3004.0,
+        "change_pct": pytest.approx(-11.78, abs=0.01),
+    }
+    assert metrics["operating_income"]["value"] == 923.0
+    assert metrics["net_income"]["prior_value"] == 1400.0
+    assert metrics["operating_cash_flow"]["value"] == 2540.0
+    assert metrics["capital_expenditures"]["value"] == -2394.0
+    assert metrics["free_cash_flow"]["value"] == 146.0
+
+
+def test_leading_note_references_are_still_dropped():
+    page = "Consolidated Balance Sheets\nDecember 31, 2024 2023\nTotal assets 4 122,070 106,618\n"
+    assert compute_metrics(parse_statements([(0, page)]))["total_assets"]["value"] == 122070.0
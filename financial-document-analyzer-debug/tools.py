@@ -1,35 +1,83 @@
 ## Importing libraries and files
+import inspect
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 from crewai.tools import tool
-from crewai_tools import SerperDevTool
+from pydantic import create_model
+
+from extraction import extract_pages, format_pages
+from retrieval import retrieve, format_chunks, pack_pages, READ_TOKEN_BUDGET
+from statements import extract_statements, summarize
+from search import cached_search
+
+def _with_defaults(crew_tool):
+    """Let agents omit optional arguments of a ``@tool`` function.
+
+    crewai's ``@tool`` marks every argument as required, so a call passing only
+    ``file_path`` and ``query`` would fail argument validation.
+    """
+    parameters = inspect.signature(crew_tool.func).parameters.values()
+    crew_tool.args_schema = create_model(
+        crew_tool.args_schema.__name__,
+        **{p.name: (p.annotation, ... if p.default is p.empty else p.default) for p in parameters},
+    )
+    return crew_tool
+
 
 ## Creating search tool
-search_tool = SerperDevTool()
+# Lookups go through search.py: normalized, cached, coalesced and capped per
+# crew run. The backend (Serper or local fixtures) is chosen by SEARCH_BACKEND.
+@tool("Search the internet")
+def web_search_tool(search_query: str) -> str:
+    """Search the internet for market context, industry comparisons and recent news.
+
+    Results are cached, so repeating a query (or a rephrasing of it) is cheap,
+    but the number of new searches per analysis is limited. Prefer a few
+    specific queries such as "<company> <topic> <year>".
+
+    Args:
+        search_query (str): What to search for.
+
+    Returns:
+        str: The top results, each with title, snippet and link.
+    """
+    return cached_search(search_query)
+
+
+# Assign tools.search_tool to substitute another search tool
+search_tool = web_search_tool
+
+
+def get_search_tool():
+    """Return the search tool handed to the agents."""
+    return search_tool
 
 ## Creating custom pdf reader tool
+@_with_defaults
 @tool("Read Financial Document")
-def read_data_tool(file_path: str = 'data/sample.pdf', max_pages: int = 50, focus_sections: bool = True) -> str:
+def read_data_tool(file_path: str = 'data/sample.pdf', max_pages: int = 50, focus_sections: bool = True, query: str = '') -> str:
     """Tool to read and extract text data from a PDF financial document.
     
     IMPORTANT: Always use the file_path provided in the task context. The file_path variable 
     contains the exact path to the uploaded financial document that needs to be analyzed.
     
-    For large documents, this tool automatically focuses on key financial sections to avoid token limits.
+    Each result is limited to a fixed token budget; it never contains the whole document. Pass a query to get the passages most relevant to it; without one, the pages with the
+    most financial content that fit the budget are returned. Call again with a different query to
+    read other parts of the document.
 
     Args:
         file_path (str): Path of the pdf file to read. Use the {file_path} variable from the task context.
-        max_pages (int): Maximum number of pages to extract (default: 50). Set to 0 for all pages.
-        focus_sections (bool): If True, prioritize financial statement sections (default: True).
+        max_pages (int): Pages to choose from when no query is given (default: 50, 0 for all pages).
+            Only the pages that fit the token budget are returned.
+        focus_sections (bool): If True, prefer financial statement pages when choosing (default: True).
+        query (str): Question or topic to retrieve relevant passages for. Use the {query} variable from the task context.
 
     Returns:
-        str: Full text content of the financial document (or key sections for large documents).
+        str: The passages most relevant to the query, or the key financial pages, within the token
+            budget. A NOTE line gives the document's page count and what was included.
     """
-    import os
-    from pypdf import PdfReader
-
     # Check if file exists
     if not os.path.exists(file_path):
         # Try to find the file in data directory if default path doesn't exist
@@ -55,58 +103,60 @@ def read_data_tool(file_path: str = 'data/sample.pdf', max_pages: int = 50, focu
             return f"ERROR: File not found at path: {file_path}. Available PDFs in data/: {[f for f in os.listdir('data') if f.endswith('.pdf')] if os.path.exists('data') else 'data directory not found'}"
     
     try:
-        reader = PdfReader(file_path)
-        total_pages = len(reader.pages)
-        
-        # Key financial section keywords to prioritize
-        financial_keywords = [
-            'income statement', 'balance sheet', 'cash flow', 'financial statements',
-            'revenue', 'net income', 'earnings', 'eps', 'ebitda', 'margins',
-            'assets', 'liabilities', 'equity', 'debt', 'cash and cash equivalents',
-            'operating', 'investing', 'financing', 'quarterly', 'annual',
-            'consolidated', 'unaudited', 'audited', 'management discussion'
-        ]
-        
-        full_report = ""
-        prioritized_pages = []
-        other_pages = []
-        
-        # First pass: identify pages with financial content
-        if focus_sections and total_pages > 30:  # Only prioritize if document is large
-            for i, page in enumerate(reader.pages):
-                content = page.extract_text()
-                if content:
-                    content_lower = content.lower()
-                    # Check if page contains financial keywords
-                    has_financial_content = any(keyword in content_lower for keyword in financial_keywords)
-                    if has_financial_content:
-                        prioritized_pages.append((i, content))
-                    else:
-                        other_pages.append((i, content))
-            
-            # Combine: prioritized pages first, then other pages (limited)
-            pages_to_extract = prioritized_pages + other_pages[:max(0, max_pages - len(prioritized_pages))]
-        else:
-            # For smaller documents or when focus_sections=False, extract all or up to max_pages
-            limit = max_pages if max_pages > 0 else total_pages
-            pages_to_extract = [(i, page.extract_text()) for i, page in enumerate(reader.pages[:limit])]
-        
-        # Extract and format text
-        for page_num, content in pages_to_extract:
-            if content:
-                # Clean and format the financial document data
-                # Remove extra whitespaces and format properly
-                while "\n\n" in content:
-                    content = content.replace("\n\n", "\n")
-                full_report += f"[Page {page_num + 1}]\n{content}\n\n"
+        if query and query.strip():
+            retrieved = retrieve(file_path, query, token_budget=READ_TOKEN_BUDGET)
+            if retrieved["chunks"]:
+                pages_used = len({chunk["page"] for chunk in retrieved["chunks"]})
+                return (
+                    f"NOTE: Document has {retrieved['total_pages']} pages. Showing the {len(retrieved['chunks'])} passages "
+                    f"(from {pages_used} pages, about {retrieved['tokens']} tokens) most relevant to: {query}\n\n"
+                    + format_chunks(retrieved["chunks"])
+                )
+            # Nothing matched the query: fall back to the key financial pages
+
+        extraction = extract_pages(file_path, max_pages=max_pages, focus_sections=focus_sections)
+        total_pages = extraction["total_pages"]
+        # Without a query the same token budget applies: keep the most financial pages that fit
+        pages_to_extract, tokens = pack_pages(extraction["pages"], READ_TOKEN_BUDGET)
+        full_report = format_pages(pages_to_extract)
         
         if not full_report.strip():
             return f"WARNING: File {file_path} was read but contains no extractable text. The PDF might be image-based or corrupted."
         
         # Add summary note if document was truncated
         if total_pages > len(pages_to_extract):
-            full_report = f"NOTE: Document has {total_pages} pages. Extracted {len(pages_to_extract)} key pages focusing on financial statements and metrics.\n\n" + full_report
+            full_report = (
+                f"NOTE: Document has {total_pages} pages. Extracted {len(pages_to_extract)} key pages (about {tokens} tokens) "
+                "focusing on financial statements and metrics. Pass a query to read the passages most relevant to it.\n\n"
+                + full_report
+            )
         
         return full_report
     except Exception as e:
         return f"ERROR reading file {file_path}: {str(e)}"
+
+## Creating structured financial statements tool
+@_with_defaults
+@tool("Read Financial Statements")
+def read_financial_statements_tool(file_path: str = 'data/sample.pdf') -> str:
+    """Tool to get the key financial metrics of a PDF financial document without reading its full text.
+
+    Parses the income statement, balance sheet and cash flow tables and returns a compact summary of
+    revenue, profit, EPS, cash, debt and cash flow figures with year-over-year changes. Use it first,
+    then use the Read Financial Document tool only for details the summary does not cover.
+
+    Args:
+        file_path (str): Path of the pdf file to read. Use the {file_path} variable from the task context.
+
+    Returns:
+        str: Key metrics with the latest period, the prior-year period and the change for each.
+    """
+    if not os.path.exists(file_path):
+        return f"ERROR: File not found at path: {file_path}"
+    try:
+        summary = summarize(extract_statements(file_path))
+    except Exception as e:
+        return f"ERROR reading financial statements from {file_path}: {str(e)}"
+    if not summary:
+        return "No financial statement tables could be parsed from this document. Use the Read Financial Document tool instead."
+    return summary
@@ -0,0 +1,335 @@
+## Importing libraries and files
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+import zipfile
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from cache import register_file_hash
+from metrics import span
+
+## Upload limits
+# Uploads are streamed to disk in UPLOAD_CHUNK_BYTES chunks and rejected once
+# they exceed UPLOAD_MAX_BYTES, so a large filing never sits in memory whole.
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_DIR = "data"
+# Room for multipart framing and form fields on top of the file itself
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+# Whole request body of /analyze-batch (files and zip archives together)
+BATCH_UPLOAD_MAX_BYTES = int(os.environ.get("BATCH_UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# PDF files start with this marker (the spec allows it within the first 1024 bytes)
+PDF_MAGIC = b"%PDF-"
+
+
+class UploadError(Exception):
+    """Raised when an upload is rejected; carries the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class UploadLimits:
+    """Limits one route enforces while its request body is still arriving."""
+    max_body: int
+    # Per file part; None leaves file parts to the endpoint
+    max_file: int = None
+    pdf_only: bool = False
+
+
+@dataclass
+class SavedUpload:
+    path: str
+    sha256: str
+    size: int
+
+
+def _open_new_upload(directory: str) -> tuple:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.abspath(os.path.join(directory, f"financial_document_{uuid.uuid4()}.pdf"))
+    return path, open(path, "wb")
+
+
+def _remove(path: str) -> None:
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Ignore cleanup errors
+
+
+async def save_upload(file, directory: str = UPLOAD_DIR, max_bytes: int = UPLOAD_MAX_BYTES) -> SavedUpload:
+    """Stream an ``UploadFile`` to disk, validating and hashing it on the way.
+
+    Raises ``UploadError`` (400 for a non-PDF or empty file, 413 when larger
+    than ``max_bytes``). Disk writes run in worker threads so the event loop
+    never blocks on them.
+    """
+    with span("upload", "pdf"):
+        return await _save_upload(file, directory, max_bytes)
+
+
+async def _save_upload(file, directory: str, max_bytes: int) -> SavedUpload:
+    path, handle = await asyncio.to_thread(_open_new_upload, directory)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if size == 0 and PDF_MAGIC not in chunk[:1024]:
+                raise UploadError(400, "Uploaded file is not a PDF document")
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadError(413, f"Uploaded file exceeds the {max_bytes / (1024 * 1024):g} MB limit")
+            hasher.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+        if size == 0:
+            raise UploadError(400, "Uploaded file is empty")
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        await remove_upload(path)
+        raise
+    await asyncio.to_thread(handle.close)
+
+    digest = hasher.hexdigest()
+    register_file_hash(path, digest)
+    return SavedUpload(path=path, sha256=digest, size=size)
+
+
+def _too_large(what: str, max_bytes: int) -> UploadError:
+    return UploadError(413, f"{what} exceeds the {max_bytes / (1024 * 1024):g} MB limit")
+
+
+def _body_too_large(limits: UploadLimits) -> UploadError:
+    # Single-file routes report the documented file limit, not the body limit
+    # that includes room for the form framing
+    if limits.max_file:
+        return _too_large("Uploaded file", limits.max_file)
+    return _too_large("Request body", limits.max_body)
+
+
+class _FilePartChecker:
+    """Incremental multipart parser that checks file parts without keeping their bytes."""
+
+    def __init__(self, boundary: bytes, limits: UploadLimits):
+        try:
+            from python_multipart.multipart import MultipartParser
+        except ModuleNotFoundError:  # python-multipart < 0.0.13
+            from multipart.multipart import MultipartParser
+        self.limits = limits
+        self.error = None
+        self._header_field = b""
+        self._disposition = b""
+        self._is_file = False
+        self._size = 0
+        self._head = b""
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def write(self, chunk: bytes) -> None:
+        self._parser.write(chunk)
+
+    def _on_part_begin(self):
+        self._header_field = self._disposition = self._head = b""
+        self._is_file = False
+        self._size = 0
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition += data[start:end]
+
+    def _on_header_end(self):
+        self._header_field = b""
+
+    def _on_headers_finished(self):
+        self._is_file = b"filename=" in self._disposition
+
+    def _on_part_data(self, data, start, end):
+        if not self._is_file or self.error is not None:
+            return
+        self._size += end - start
+        if self.limits.max_file and self._size > self.limits.max_file:
+            self.error = _too_large("Uploaded file", self.limits.max_file)
+        elif self.limits.pdf_only and self._head is not None:
+            self._head += data[start:min(end, start + 1024 - len(self._head))]
+            if PDF_MAGIC in self._head:
+                self._head = None
+            elif len(self._head) >= 1024:
+                self.error = UploadError(400, "Uploaded file is not a PDF document")
+
+    def _on_part_end(self):
+        if self._is_file and self.limits.pdf_only and self._size and self._head is not None and self.error is None:
+            self.error = UploadError(400, "Uploaded file is not a PDF document")
+
+
+class UploadGuardMiddleware:
+    """Reject oversized or non-PDF uploads while the request body is still arriving.
+
+    Starlette reads the whole multipart body into temporary files before an
+    endpoint runs, so ``save_upload`` alone only sees a bad upload after it
+    was received in full. ``routes`` maps POST paths to their ``UploadLimits``:
+    a declared Content-Length over ``max_body`` is answered with 413 before the
+    body is read, and the body is checked chunk by chunk as the form parser
+    consumes it, so an oversized or non-PDF file stops the request at the
+    chunk that gives it away.
+    """
+
+    def __init__(self, app, routes: dict):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        limits = self.routes.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limits is None:
+            return await self.app(scope, receive, send)
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        try:
+            declared = int(headers.get("content-length", ""))
+        except ValueError:
+            declared = None
+        if declared is not None and declared > limits.max_body:
+            error = _body_too_large(limits)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            return await response(scope, receive, send)
+
+        checker = None
+        if limits.max_file or limits.pdf_only:
+            boundary = _multipart_boundary(headers.get("content-type", ""))
+            checker = _FilePartChecker(boundary, limits) if boundary else None
+        received = 0
+
+        async def guarded_receive():
+            nonlocal received, checker
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            # Chunked requests declare no length, so the cap applies to the bytes received
+            error = _body_too_large(limits) if received > limits.max_body else None
+            if error is None and checker is not None:
+                try:
+                    checker.write(chunk)
+                    error = checker.error
+                except Exception:
+                    # Malformed bodies are left to the form parser to report
+                    checker = None
+            if error is not None:
+                raise HTTPException(status_code=error.status_code, detail=error.detail)
+            return message
+
+        return await self.app(scope, guarded_receive, send)
+
+
+def _multipart_boundary(content_type: str):
+    try:
+        from python_multipart.multipart import parse_options_header
+    except ModuleNotFoundError:  # python-multipart < 0.0.13
+        from multipart.multipart import parse_options_header
+    media_type, options = parse_options_header(content_type)
+    if media_type != b"multipart/form-data":
+        return None
+    return options.get(b"boundary")
+
+
+async def remove_upload(path: str) -> None:
+    """Delete an uploaded file without blocking the event loop."""
+    await asyncio.to_thread(_remove, path)
+
+
+def is_zip_upload(file) -> bool:
+    filename = (file.filename or "").lower()
+    return filename.endswith(".zip") or file.content_type in ("application/zip", "application/x-zip-compressed")
+
+
+def _extract_zip_pdfs(archive_path: str, directory: str, max_bytes: int) -> list:
+    """Copy every PDF member of a zip archive into ``directory``, hashing as it goes.
+
+    Returns ``(member_name, SavedUpload or UploadError)`` pairs.
+    """
+    results = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            name = member.filename
+            if member.is_dir() or not name.lower().endswith(".pdf") or name.startswith("__MACOSX/"):
+                continue
+            if member.file_size > max_bytes:
+                results.append((name, UploadError(413, f"{name} exceeds the {max_bytes / (1024 * 1024):g} MB limit")))
+                continue
+            path, handle = _open_new_upload(directory)
+            hasher = hashlib.sha256()
+            size = 0
+            error = None
+            with handle, archive.open(member) as source:
+                for chunk in iter(lambda: source.read(UPLOAD_CHUNK_BYTES), b""):
+                    if size == 0 and PDF_MAGIC not in chunk[:1024]:
+                        error = UploadError(400, f"{name} is not a PDF document")
+                        break
+                    size += len(chunk)
+                    # Declared sizes can lie, so enforce the cap on the bytes actually inflated
+                    if size > max_bytes:
+                        error = UploadError(413, f"{name} exceeds the {max_bytes / (1024 * 1024):g} MB limit")
+                        break
+                    hasher.update(chunk)
+                    handle.write(chunk)
+            if error is None and size == 0:
+                error = UploadError(400, f"{name} is empty")
+            if error is not None:
+                _remove(path)
+                results.append((name, error))
+                continue
+            digest = hasher.hexdigest()
+            register_file_hash(path, digest)
+            results.append((name, SavedUpload(path=path, sha256=digest, size=size)))
+    return results
+
+
+async def save_zip_upload(file, directory: str = UPLOAD_DIR, max_bytes: int = UPLOAD_MAX_BYTES) -> list:
+    """Stream a zip upload to a temporary file and unpack its PDFs into ``directory``.
+
+    Returns ``(member_name, SavedUpload or UploadError)`` pairs; raises
+    ``UploadError`` if the archive itself is unreadable.
+    """
+    with span("upload", "zip"):
+        return await _save_zip_upload(file, directory, max_bytes)
+
+
+async def _save_zip_upload(file, directory: str, max_bytes: int) -> list:
+    handle = await asyncio.to_thread(tempfile.NamedTemporaryFile, suffix=".zip", delete=False)
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            await asyncio.to_thread(handle.write, chunk)
+        await asyncio.to_thread(handle.close)
+        try:
+            return await asyncio.to_thread(_extract_zip_pdfs, handle.name, directory, max_bytes)
+        except zipfile.BadZipFile:
+            raise UploadError(400, f"{file.filename} is not a valid zip archive")
+    finally:
+        if not handle.closed:
+            await asyncio.to_thread(handle.close)
+        await remove_upload(handle.name)
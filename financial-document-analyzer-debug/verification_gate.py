@@ -0,0 +1,129 @@
+## Importing libraries and files
+import json
+import os
+import re
+
+from pydantic import BaseModel
+
+from extraction import extract_pages, financial_keywords, format_pages
+from statements import TABLE_ROW
+
+## Verification gate
+# Runs before the crew so obviously invalid uploads never reach the analyst,
+# advisor and risk agents. VERIFICATION_GATE selects the behaviour:
+#   off      - no gate, the crew's verification task is the only check
+#   precheck - deterministic keyword/table check only; inconclusive documents pass
+#   full     - deterministic check, and the verifier LLM decides inconclusive documents
+VERIFICATION_GATE = os.environ.get("VERIFICATION_GATE", "full").strip().lower()
+# Characters of extracted text sent to the verifier LLM
+VERIFICATION_SAMPLE_CHARS = int(os.environ.get("VERIFICATION_SAMPLE_CHARS", "6000"))
+
+
+class DocumentRejectedError(Exception):
+    """Raised when the gate decides an upload is not a financial document."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class VerificationVerdict(BaseModel):
+    """Structured yes/no answer expected from the verifier LLM."""
+    is_financial_document: bool
+    reason: str
+
+
+def precheck(text: str) -> dict:
+    """Score extracted text on financial keyword density and statement-table rows.
+
+    Returns the metrics plus a ``verdict`` of ``"pass"``, ``"fail"`` or
+    ``"uncertain"``.
+    """
+    text_lower = text.lower()
+    word_count = len(text_lower.split())
+    keyword_counts = {keyword: text_lower.count(keyword) for keyword in financial_keywords}
+    distinct_keywords = sum(1 for count in keyword_counts.values() if count)
+    keyword_hits = sum(keyword_counts.values())
+    density = keyword_hits * 1000 / word_count if word_count else 0.0
+    table_rows = sum(1 for line in text.splitlines() if TABLE_ROW.match(line.strip()))
+
+    if word_count == 0:
+        verdict, reason = "fail", "The document contains no extractable text (it may be image-based or corrupted)."
+    elif distinct_keywords < 3 and table_rows < 3:
+        verdict, reason = "fail", (
+            f"The document does not look like a financial report: {distinct_keywords} financial keywords "
+            f"and {table_rows} statement table rows found."
+        )
+    elif distinct_keywords >= 8 and table_rows >= 5 and density >= 5:
+        verdict, reason = "pass", "Financial statement tables and terminology detected."
+    else:
+        verdict, reason = "uncertain", "Some financial content detected, but not enough to decide deterministically."
+
+    return {
+        "verdict": verdict,
+        "reason": reason,
+        "word_count": word_count,
+        "distinct_keywords": distinct_keywords,
+        "keyword_density": round(density, 2),
+        "table_rows": table_rows,
+    }
+
+
+def _parse_verdict(response: str) -> VerificationVerdict:
+    match = re.search(r"\{.*\}", response, re.DOTALL)
+    if match is None:
+        raise ValueError(f"Verifier returned no JSON object: {response[:200]}")
+    return VerificationVerdict.model_validate(json.loads(match.group(0)))
+
+
+def ask_verifier(text: str, llm) -> VerificationVerdict:
+    """Ask the verifier LLM for a structured yes/no on a sample of the document."""
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a Financial Document Verification Specialist. You decide whether a document "
+                       "is a financial report (annual or quarterly report, 10-K, 10-Q, earnings update, "
+                       "financial statements). Answer only with a JSON object of the form "
+                       '{"is_financial_document": true or false, "reason": "one sentence"}.',
+        },
+        {
+            "role": "user",
+            "content": f"Document excerpt:\n\n{text[:VERIFICATION_SAMPLE_CHARS]}",
+        },
+    ]
+    return _parse_verdict(llm.call(messages))
+
+
+def verify_document(file_path: str, mode: str = None, llm=None) -> dict:
+    """Decide whether ``file_path`` is worth a full analysis.
+
+    Raises ``DocumentRejectedError`` with the reason when it is not; otherwise
+    returns the precheck metrics and how the decision was made. The document
+    is parsed once and cached, so the agents' tools reuse its pages afterwards;
+    the check reads the same selection as ``read_data_tool``'s defaults.
+    """
+    mode = mode or VERIFICATION_GATE
+    if mode == "off":
+        return {"decided_by": "off"}
+
+    extraction = extract_pages(file_path, max_pages=50, focus_sections=True)
+    text = format_pages(extraction["pages"])
+    result = precheck(text)
+
+    if result["verdict"] == "fail":
+        raise DocumentRejectedError(result["reason"])
+    if result["verdict"] == "pass" or mode == "precheck":
+        return {**result, "decided_by": "precheck"}
+
+    if llm is None:
+        from agents import get_llm
+        llm = get_llm()
+    try:
+        verdict = ask_verifier(text, llm)
+    except ValueError as e:
+        # An unparseable answer should not block a plausible document
+        print(f"Verifier gate answer ignored: {e}")
+        return {**result, "decided_by": "precheck"}
+    if not verdict.is_financial_document:
+        raise DocumentRejectedError(verdict.reason)
+    return {**result, "reason": verdict.reason, "decided_by": "verifier"}